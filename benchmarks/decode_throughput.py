@@ -0,0 +1,55 @@
+"""
+Decode throughput of the wire protocol, valid and malformed frames
+
+    python benchmarks/decode_throughput.py [frames]
+"""
+import random
+import sys
+import time
+
+from bluetooth_speaker_bulb.const import *
+from bluetooth_speaker_bulb.protocol import decode_function, encode_msg
+
+
+def frames():
+    valid = [
+        encode_msg(GetBulbCategory.light.value, GetLightFunction.status.value,
+                   [0, 0, 0, 0x75, 0x8a, 0x8d, 1, 0, 0x50]),
+        encode_msg(GetBulbCategory.timer.value, GetTimerFunction.auto_light.value,
+                   [0, 12, 0, 12, 0]),
+        encode_msg(GetBulbCategory.timer.value, GetTimerFunction.alarm_1.value,
+                   [0, 0x14, 0x10, 1, 1, 1, 6, 0x2d, 0, 1]),
+        encode_msg(GetBulbCategory.speaker.value, GetSpeakerFunction.volume.value, 0x20),
+        encode_msg(GetBulbCategory.speaker.value, GetSpeakerFunction.equalizer.value,
+                   [0x32] * 5),
+    ]
+    rng = random.Random(0)
+    malformed = []
+    for frame in valid:
+        malformed.append(frame[:rng.randrange(len(frame))])
+        corrupted = bytearray(frame)
+        corrupted[rng.randrange(len(frame))] ^= 0xff
+        malformed.append(corrupted)
+    return [bytes(f) for f in valid], [bytes(f) for f in malformed]
+
+
+def run(name, batch, count):
+    batch = batch * (count // len(batch))
+    start = time.perf_counter()
+    for frame in batch:
+        decode_function(frame)
+    elapsed = time.perf_counter() - start
+    print(f"{name:10} {len(batch):>9} frames {elapsed:6.2f}s {len(batch) / elapsed:>12,.0f} frames/s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    valid, malformed = frames()
+    for frame in malformed:
+        assert decode_function(frame) == [], frame.hex()
+    run("valid", valid, count)
+    run("malformed", malformed, count)
+
+
+if __name__ == "__main__":
+    main()
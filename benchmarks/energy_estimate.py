@@ -0,0 +1,47 @@
+"""
+Energy estimate over a month of state history for a fleet
+
+    python benchmarks/energy_estimate.py [bulbs] [transitions per bulb]
+"""
+import random
+import sys
+import time
+
+from bluetooth_speaker_bulb.const import MODEL_BLUETOOTH_SPEAKER_BULB
+from bluetooth_speaker_bulb.energy import EnergyEstimator
+from bluetooth_speaker_bulb.history import StateHistory
+
+MONTH = 30 * 24 * 3600
+
+
+def fleet(bulbs, transitions):
+    rng = random.Random(0)
+    histories = {}
+    for i in range(bulbs):
+        history = StateHistory(capacity=transitions)
+        timestamp = 0.0
+        for _ in range(transitions):
+            timestamp += rng.expovariate(transitions / MONTH)
+            history.record(timestamp, on=rng.random() < 0.6, brightness=rng.randrange(256),
+                           r=rng.randrange(256), g=rng.randrange(256), b=rng.randrange(256),
+                           volume=rng.randrange(101))
+        histories[f"00:00:00:00:{i // 256:02X}:{i % 256:02X}"] = history
+    return histories
+
+
+def main():
+    bulbs = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    transitions = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+    histories = fleet(bulbs, transitions)
+    models = dict.fromkeys(histories, MODEL_BLUETOOTH_SPEAKER_BULB)
+    estimator = EnergyEstimator()
+    start = time.perf_counter()
+    result = estimator.estimate(histories, 0, MONTH, models)
+    elapsed = time.perf_counter() - start
+    total = sum(r['wh'] for r in result.values())
+    print(f"{bulbs} bulbs x {transitions} transitions: {elapsed * 1000:.1f} ms, "
+          f"{total / 1000:.1f} kWh")
+
+
+if __name__ == "__main__":
+    main()
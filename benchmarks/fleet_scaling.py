@@ -0,0 +1,50 @@
+"""
+Command throughput of a sharded fleet of simulated bulbs by worker count
+
+    python benchmarks/fleet_scaling.py [bulbs] [rounds] [max shards]
+
+Every bulb runs `rounds` state polls (request, notification, decode) back
+to back, all bulbs at once. Scaling flattens at the number of CPU cores.
+"""
+import asyncio
+import os
+import sys
+import time
+
+from bluetooth_speaker_bulb.fleet import Fleet
+
+
+async def run(bulbs, rounds, shards):
+    addresses = [f"00:00:00:00:{i // 256:02X}:{i % 256:02X}" for i in range(bulbs)]
+    fleet = Fleet(addresses, shards=shards, simulate=0.0)
+    await fleet.start()
+    try:
+        # warm up, lets the pacing learn the simulated processing time
+        await asyncio.gather(*(fleet.call(mac, 'update_light') for mac in addresses))
+
+        async def poll(mac):
+            for _ in range(rounds):
+                await fleet.call(mac, 'update_light')
+
+        start = time.perf_counter()
+        await asyncio.gather(*(poll(mac) for mac in addresses))
+        elapsed = time.perf_counter() - start
+    finally:
+        await fleet.stop()
+    calls = bulbs * rounds
+    print(f"{shards:>2} workers {calls:>7} calls {elapsed:6.2f}s {calls / elapsed:>9,.0f} calls/s")
+
+
+def main():
+    bulbs = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    max_shards = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count() or 1
+    print(f"{os.cpu_count()} CPU cores")
+    shards = 1
+    while shards <= max_shards:
+        asyncio.run(run(bulbs, rounds, shards))
+        shards *= 2
+
+
+if __name__ == "__main__":
+    main()
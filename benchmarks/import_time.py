@@ -0,0 +1,53 @@
+"""
+Import time of the light layers, measured with python -X importtime
+
+    python benchmarks/import_time.py [runs]
+
+Fails if a module goes over its budget or pulls in bleak.
+"""
+import subprocess
+import sys
+
+# module: budget in milliseconds, cumulative import time, best of runs
+BUDGETS = {
+    'bluetooth_speaker_bulb': 30,
+    'bluetooth_speaker_bulb.protocol': 30,
+    'bluetooth_speaker_bulb.const': 30,
+    # asyncio and argparse dominate, bleak is only loaded when a command runs
+    'bluetooth_speaker_bulb.magicblueshell': 120,
+}
+
+
+def measure(module: str) -> tuple[float, bool]:
+    """
+    :return: cumulative import time in ms and whether bleak was imported
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        capture_output=True, text=True, check=True)
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, total, name = line.split('|')
+        if total.strip().isdigit():
+            cumulative[name.strip()] = int(total) / 1000
+    return cumulative[module], 'bleak' in cumulative
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    ok = True
+    for module, budget in BUDGETS.items():
+        samples = [measure(module) for _ in range(runs)]
+        best = min(ms for ms, _ in samples)
+        bleak = any(b for _, b in samples)
+        passed = best <= budget and not bleak
+        ok &= passed
+        print(f"{module:40} {best:7.1f} ms  budget {budget:4} ms"
+              f"{'  imports bleak' if bleak else ''}  {'ok' if passed else 'FAIL'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
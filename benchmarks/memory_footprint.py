@@ -0,0 +1,82 @@
+"""
+Per bulb memory of the state models at fleet scale
+
+    python benchmarks/memory_footprint.py [devices]
+
+before: models with a per instance __dict__ holding the decoded dicts
+after:  __slots__ models, state frozen into a LightSnapshots array
+"""
+import sys
+import tracemalloc
+
+from bluetooth_speaker_bulb.light import Light
+from bluetooth_speaker_bulb.snapshot import LightSnapshots
+from bluetooth_speaker_bulb.speaker import Speaker
+
+
+def raw_light(i):
+    return [{'r': i % 256, 'g': 0, 'b': 0, 'cold': 0x75, 'warm': 0x8a,
+             'brightness': 0x8d, 'on': 1, 'effect_raw': 0}]
+
+
+def raw_speaker(i):
+    return [{'volume': i % 32},
+            {'frequency_80': 50, 'frequency_200': 50, 'frequency_500': 50,
+             'frequency_2k': 50, 'frequency_8k': 50}]
+
+
+class DictModel():
+    """Plain class like the models before __slots__"""
+
+
+def before(devices):
+    fleet = []
+    for i in range(devices):
+        light, speaker = DictModel(), DictModel()
+        data = raw_light(i)[0]
+        light._on, light._brightness = data['on'], data['brightness']
+        light._cold, light._warm = data['cold'], data['warm']
+        light._white_intensity, light._white = data['cold'], True
+        light._rgb = [data['r'], data['g'], data['b']]
+        light._effect_id, light._effect = data['effect_raw'], None
+        data = raw_speaker(i)
+        speaker._raw_data, speaker._mute = None, False
+        speaker._volume, speaker._equalizer = data[0]['volume'], data[1]
+        speaker._speaker_effect = 'flat'
+        fleet.append((light, speaker))
+    return fleet
+
+
+def after(devices):
+    fleet = []
+    snapshots = LightSnapshots()
+    for i in range(devices):
+        light, speaker = Light(), Speaker()
+        light.update(raw_light(i))
+        speaker.update(raw_speaker(i))
+        snapshots.append(light.snapshot(0.0))
+        fleet.append((light, speaker))
+    return fleet, snapshots
+
+
+def measure(build, devices):
+    tracemalloc.start()
+    result = build(devices)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size / devices
+
+
+def main():
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    old = measure(before, devices)
+    new = measure(after, devices)
+    _, snapshots = after(devices)
+    print(f"{devices} devices")
+    print(f"before  {old:8.0f} bytes per bulb")
+    print(f"after   {new:8.0f} bytes per bulb, including one packed snapshot")
+    print(f"packed snapshot {snapshots.nbytes / len(snapshots):.0f} bytes per bulb")
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,42 @@
 
 """
     Unofficial Python API to control bluetooth speaker bulb
+
+    The protocol and const layers import without any BLE dependency,
+    everything that needs bleak is loaded on first attribute access.
 """
 
 __version__ = "0.0.13"
 
+import importlib
+
+from .const import Effects, model_from_name
+
+# attribute: module it is loaded from on first access
+_LAZY_ATTRIBUTES = {
+    'BleakError': 'bleak',
+    'Bulb': '.bulb',
+    'discover_bluetooth_speaker_bulb_lamps': '.connection',
+    'find_device_by_address': '.connection',
+    'AdapterScheduler': '.adapters',
+    'Registry': '.registry',
+    'BulbScanner': '.scanner',
+    'Lane': '.lanes',
+    'Fleet': '.fleet',
+    'SyncClient': '.sync',
+}
+
+__all__ = ['Effects', 'model_from_name', *_LAZY_ATTRIBUTES]
+
+
+def __getattr__(name: str):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
 
-from bleak import BleakError
 
-from .bulb import Bulb
-from .connection import (discover_bluetooth_speaker_bulb_lamps,
-                         find_device_by_address, model_from_name)
-from .const import Effects
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+
+from bleak.backends.device import BLEDevice
+
+from .lanes import Lane
+
+_LOGGER = logging.getLogger(__name__)
+
+RSSI_UNKNOWN = -127
+# Seconds between rebalance passes of the background task
+REBALANCE_INTERVAL: float = 60.0
+
+
+class AdapterScheduler():
+    """
+    Place bulbs on the best of several HCI adapters.
+
+    Uses RSSI per adapter from discovery (feed it from one BulbScanner per
+    adapter through add_callback_on_advertisement) and the live connection
+    count per adapter. start() runs rebalance in the background.
+    """
+
+    def __init__(self, adapters: list[str], max_connections: int = 5,
+                 load_penalty: int = 3, rssi_hysteresis: int = 10,
+                 restrict: bool = False) -> None:
+        """
+        :param adapters: adapter names, hci0, hci1, ...
+        :param max_connections: connections per adapter before it is saturated
+        :param load_penalty: dB of RSSI one extra connection is worth
+        :param rssi_hysteresis: dB another adapter must be better to move a bulb
+        :param restrict: never use the default adapter, bulbs not heard yet go
+            to the least loaded of the given adapters
+        """
+        self._adapters = list(adapters)
+        self._restrict = restrict
+        self._max_connections = max_connections
+        self._load_penalty = load_penalty
+        self._rssi_hysteresis = rssi_hysteresis
+        self._rssi: dict[str, dict[str, int]] = {}
+        self._devices: dict[str, dict[str, BLEDevice]] = {}
+        self._assigned: dict[str, str] = {}
+        self._connections: dict = {}
+        self._task: asyncio.Task | None = None
+
+    def on_advertisement(self, device: BLEDevice, rssi: int, adapter: str) -> None:
+        """Callback for BulbScanner.add_callback_on_advertisement"""
+        if adapter not in self._adapters:
+            return
+        address = device.address.upper()
+        self._rssi.setdefault(address, {})[adapter] = rssi
+        self._devices.setdefault(address, {})[adapter] = device
+
+    def register(self, connection) -> None:
+        """Track a connection so rebalance can move it"""
+        self._connections[connection.ble_device.address.upper()] = connection
+
+    def load(self, adapter: str) -> int:
+        """
+        :return: number of bulbs assigned to the adapter
+        """
+        return sum(1 for a in self._assigned.values() if a == adapter)
+
+    def rssi(self, address: str, adapter: str) -> int:
+        return self._rssi.get(address.upper(), {}).get(adapter, RSSI_UNKNOWN)
+
+    def _score(self, address: str, adapter: str) -> int | None:
+        load = self.load(adapter)
+        if self._assigned.get(address) == adapter:
+            load -= 1
+        if load >= self._max_connections:
+            return None
+        return self.rssi(address, adapter) - self._load_penalty * load
+
+    def _best(self, address: str) -> str | None:
+        best = None
+        best_score = None
+        for adapter in self._adapters:
+            if adapter not in self._rssi.get(address, {}):
+                continue
+            score = self._score(address, adapter)
+            if score is not None and (best_score is None or score > best_score):
+                best, best_score = adapter, score
+        return best
+
+    def assign(self, address: str, default: BLEDevice) -> tuple[str | None, BLEDevice]:
+        """
+        Pick an adapter for a bulb about to connect
+
+        :param address: mac address
+        :param default: device to use if the bulb was not seen on any adapter
+        :return: adapter (None for the default adapter) and the BLEDevice
+            as seen from that adapter
+        """
+        address = address.upper()
+        self._assigned.pop(address, None)
+        adapter = self._best(address)
+        if adapter is None:
+            if not self._restrict or not self._adapters:
+                _LOGGER.debug(f"Adapter: no RSSI for {address}, using default")
+                return None, default
+            adapter = min(self._adapters, key=self.load)
+            _LOGGER.debug(f"Adapter: no RSSI for {address}, using least loaded {adapter}")
+        self._assigned[address] = adapter
+        _LOGGER.debug(
+            f"Adapter: {address} on {adapter}, rssi {self.rssi(address, adapter)}, load {self.load(adapter)}")
+        return adapter, self._devices.get(address, {}).get(adapter, default)
+
+    def release(self, address: str) -> None:
+        self._assigned.pop(address.upper(), None)
+
+    def assignments(self) -> dict[str, str]:
+        return dict(self._assigned)
+
+    def plan_rebalance(self) -> list[tuple[str, str, str]]:
+        """
+        Find bulbs on a saturated adapter or with a clearly better adapter
+
+        :return: list of (address, from adapter, to adapter)
+        """
+        moves = []
+        for address, current in list(self._assigned.items()):
+            best = self._best(address)
+            if best is None or best == current:
+                continue
+            saturated = self.load(current) >= self._max_connections
+            better = self.rssi(address, best) - self.rssi(address, current) \
+                >= self._rssi_hysteresis
+            if saturated or better:
+                moves.append((address, current, best))
+                # account for the move before planning the next one
+                self._assigned[address] = best
+        for address, current, _ in moves:
+            self._assigned[address] = current
+        return moves
+
+    async def rebalance(self) -> list[tuple[str, str, str]]:
+        """
+        Reconnect bulbs that should move, connect() picks the new adapter
+
+        :return: moves that were made
+        """
+        moves = []
+        for address, current, best in self.plan_rebalance():
+            connection = self._connections.get(address)
+            if connection is None:
+                continue
+            _LOGGER.info(f"Adapter: moving {address} from {current} to {best}")
+            # wait for the link like any other bulk command, connect() picks the new adapter
+            async with connection.lanes.slot(Lane.BULK):
+                moved = await connection.connect()
+            if moved:
+                moves.append((address, current, best))
+        return moves
+
+    def start(self, interval: float = REBALANCE_INTERVAL) -> None:
+        """
+        Start a background task that rebalances every interval
+
+        :param interval: seconds between passes
+        """
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self) -> None:
+        """Stop the background task"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.rebalance()
+            except Exception as err:
+                _LOGGER.error(f"Adapter: rebalance failed: {err}")
@@ -0,0 +1,90 @@
+import logging
+import time
+from enum import Enum
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class BreakerState(Enum):
+    """
+    An enum of circuit breaker states
+    """
+    CLOSED = 0
+    OPEN = 1
+    HALF_OPEN = 2
+
+
+class CircuitBreaker():
+    """
+    Per device circuit breaker.
+
+    Opens after `failure_threshold` consecutive failures, fails fast while
+    open and lets one half-open probe through after `cool_down` seconds.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, cool_down: float = 30.0) -> None:
+        self._name = name
+        self._failure_threshold = failure_threshold
+        self._cool_down = cool_down
+        self._state = BreakerState.CLOSED
+        self._failures = 0
+        self._opened_at: float = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """
+        Check if an operation may be attempted now
+        """
+        if self._state == BreakerState.CLOSED:
+            return True
+        if self._state == BreakerState.OPEN:
+            if time.monotonic() - self._opened_at < self._cool_down:
+                return False
+            _LOGGER.debug(f"Breaker {self._name}: half open, probing")
+            self._state = BreakerState.HALF_OPEN
+            self._probing = False
+        # half open, only a single probe at a time
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        if self._state != BreakerState.CLOSED:
+            _LOGGER.debug(f"Breaker {self._name}: closed")
+        self._state = BreakerState.CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probing = False
+        if self._state == BreakerState.HALF_OPEN \
+                or self._failures >= self._failure_threshold:
+            if self._state != BreakerState.OPEN:
+                _LOGGER.warning(
+                    f"Breaker {self._name}: open after {self._failures} failures")
+            self._state = BreakerState.OPEN
+            self._opened_at = time.monotonic()
+
+    def record_cancelled(self) -> None:
+        """An allowed operation was cancelled, frees the half-open probe without counting"""
+        self._probing = False
+
+    def reset(self) -> None:
+        self._state = BreakerState.CLOSED
+        self._failures = 0
+        self._probing = False
+
+    @property
+    def state(self) -> BreakerState:
+        """Get state."""
+        if self._state == BreakerState.OPEN \
+                and time.monotonic() - self._opened_at >= self._cool_down:
+            return BreakerState.HALF_OPEN
+        return self._state
+
+    @property
+    def failures(self) -> int:
+        """Get consecutive failures."""
+        return self._failures
@@ -4,34 +4,131 @@ from typing import Callable
 # import connection
 from bleak.backends.device import BLEDevice
 
-from .connection import Connection
+from .connection import Connection, model_from_name
 from .const import *
+from .history import StateHistory
+from .lanes import Lane
 from .light import Light
+from .registry import Registry
 from .speaker import Speaker
+from .timer import Timer
+
+# Bulb methods that change the bulb, exposed by the gateway and the MQTT bridge
+SETTERS = (
+    'turn_on', 'turn_off', 'set_brightness', 'set_color_rgb', 'set_white',
+    'set_white_intensity', 'set_effect', 'set_volume', 'set_speaker_effect',
+    'set_frequency_level',
+)
+# Bulb methods callable by name from another thread or process
+METHODS = SETTERS + (
+    'update', 'update_light', 'update_speaker', 'update_timer', 'set_schedule',
+)
 
 
 class Bulb():
-    def __init__(self, ble_device: BLEDevice) -> None:
-        self._connection = Connection(ble_device, timeout=20, retries=3)
-        self._light = Light()
-        self._speaker = Speaker()
+    def __init__(self, ble_device: BLEDevice, timeout: int = 20, retries: int = 3,
+                 scheduler=None, history: StateHistory = None) -> None:
+        self._connection = Connection(
+            ble_device, timeout=timeout, retries=retries, scheduler=scheduler)
+        self._history = history
+        self._light = Light(history=history)
+        self._speaker = Speaker(history=history)
+        self._timer = Timer()
+        self._light_raw: list = None
+        self._speaker_raw: list = None
+        self._refresh_task: asyncio.Task | None = None
+
+    @classmethod
+    def from_registry(cls, registry: Registry, address: str, refresh: bool = True,
+                      timeout: int = 20, retries: int = 3, scheduler=None) -> "Bulb":
+        """
+        Create a bulb from the registry without scanning. The cached state
+        is served immediately, refreshed in the background if refresh is set.
+
+        :param registry: registry to load from
+        :param address: mac address
+        :param refresh: start a background update
+        :return: Bulb or None if the address is unknown
+        """
+        ble_device = registry.ble_device(address)
+        if ble_device is None:
+            return None
+        record = registry.get(address)
+        bulb = cls(ble_device, timeout=timeout, retries=retries, scheduler=scheduler)
+        bulb._connection.handles = record.get('handles', {})
+        bulb._connection.pacer.load(record.get('pacing'))
+        bulb._light_raw = record.get('light')
+        bulb._speaker_raw = record.get('speaker')
+        bulb._light.update(raw_data=bulb._light_raw)
+        bulb._speaker.update(raw_data=bulb._speaker_raw)
+        if refresh:
+            bulb.refresh_in_background(registry)
+        return bulb
+
+    def save_to(self, registry: Registry) -> None:
+        """
+        Store model, handles and last known state in the registry
+        """
+        ble_device = self._connection.ble_device
+        details = ble_device.details
+        fields = {
+            'name': ble_device.name,
+            'model': model_from_name(ble_device.name),
+            'handles': self._connection.handles,
+            'pacing': self._connection.pacer.to_dict(),
+        }
+        if isinstance(details, dict) and details.get('path'):
+            fields['path'] = details['path']
+        if self._light_raw:
+            fields['light'] = self._light_raw
+        if self._speaker_raw:
+            fields['speaker'] = self._speaker_raw
+        registry.update(ble_device.address, **fields)
+
+    def refresh_in_background(self, registry: Registry = None) -> asyncio.Task:
+        """
+        Update state in a background task, saving to the registry when done
+        """
+        async def refresh():
+            await self.update()
+            if registry is not None:
+                self.save_to(registry)
+                registry.save()
+
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(refresh())
+        return self._refresh_task
 
     async def connect(self) -> bool:
         return await self._connection.connect()
 
     async def disconnect(self) -> bool:
+        await self._connection.stop_supervisor()
         return await self._connection.disconnect()
 
+    def start_keepalive(self) -> None:
+        """Keep the link up and reconnect in the background when it drops"""
+        self._connection.start_supervisor()
+
+    async def stop_keepalive(self) -> None:
+        await self._connection.stop_supervisor()
+
+    @property
+    def keepalive(self) -> bool:
+        """Get whether the link is kept up in the background."""
+        return self._connection.supervised
+
     async def get_device_name(self) -> str:
         return await self._connection.get_device_name()
 
-    async def send(self, msg: str) -> bool:
-        return await self._connection.send_cmd(msg)
+    async def send(self, msg: str, lane: Lane = Lane.INTERACTIVE) -> bool:
+        return await self._connection.send_cmd(msg, lane=lane)
 
-    async def receive(self, category: str, function: str) -> list:
+    async def receive(self, category: str, function: str, lane: Lane = Lane.BACKGROUND) -> list:
         return await self._connection.get_category_info(
             category=category,
-            functions=function
+            functions=function,
+            lane=lane
         )
 
     async def get_light_info(self) -> list:
@@ -46,21 +143,62 @@ class Bulb():
             function=GetSpeakerFunction
         )
 
-    async def update(self) -> None:
-        await self.update_light()
-        await self.update_speaker()
+    async def get_timer_info(self) -> list:
+        return await self._connection.get_category_info_batch(
+            category=SetBulbCategory.timer,
+            functions=GetTimerFunction,
+            lane=Lane.BULK
+        )
+
+    async def update(self) -> bool:
+        light = await self.update_light()
+        speaker = await self.update_speaker()
+        return light and speaker
+
+    async def update_light(self) -> bool:
+        raw_data = await self.get_light_info()
+        if raw_data:
+            self._light_raw = raw_data
+        self._light.update(raw_data=raw_data)
+        return bool(raw_data)
+
+    async def update_speaker(self) -> bool:
+        raw_data = await self.get_speaker_info()
+        if raw_data:
+            self._speaker_raw = raw_data
+        self._speaker.update(raw_data=raw_data)
+        return bool(raw_data)
+
+    async def update_timer(self) -> bool:
+        raw_data = await self.get_timer_info()
+        self._timer.update(raw_data=raw_data)
+        return bool(raw_data)
+
+    @property
+    def schedule(self) -> dict:
+        """Get last known timer schedule."""
+        return self._timer.schedule
 
-    async def update_light(self) -> None:
-        self._light.update(raw_data=await self.get_light_info())
+    def schedule_matches(self, schedule: dict) -> bool:
+        return self._timer.matches(schedule)
 
-    async def update_speaker(self):
-        self._speaker.update(raw_data=await self.get_speaker_info())
+    async def set_schedule(self, schedule: dict) -> bool:
+        """
+        Write only the parts of schedule that differ from the known state
+
+        :param schedule: slot name to slot dict (see :class:`.Timer`)
+        """
+        for msg in self._timer.diff(schedule):
+            if not await self._connection.send_cmd(msg, lane=Lane.BULK):
+                return False
+            self._timer.sent(msg)
+        return True
 
     async def turn_on(self, brightness: int = None, rgb_color: list = None) -> bool:
         if brightness is not None:
             return await self.set_brightness(brightness=brightness)
         if rgb_color is not None:
-            return await self.set_rgb_color(rgb_color=rgb_color)
+            return await self.set_color_rgb(rgb=rgb_color)
         return await self.send(self._light.turn_on())
 
     async def turn_off(self) -> bool:
@@ -75,8 +213,10 @@ class Bulb():
 
     async def set_color_rgb(self, rgb: list) -> bool:
         result = await self.send(self._light.set_color_rgb(rgb=rgb))
-        asyncio.sleep(0.7)
-        return result and await self.send(self._light.set_brightness(self._light.brightness))
+        if not result or self._light.brightness is None:
+            # brightness not read yet, the bulb keeps its own
+            return result
+        return await self.send(self._light.set_brightness(self._light.brightness))
 
     async def set_white_intensity(self, intensity: int) -> bool:
         return await self.send(self._light.set_white_intensity(intensity=intensity))
@@ -96,6 +236,33 @@ class Bulb():
     async def set_frequency_level(self, frequency: str, level: int) -> bool:
         return await self.send(self._speaker.set_speaker_level(level=level, function=frequency))
 
+    @property
+    def address(self) -> str:
+        """Get mac address."""
+        return self._connection.ble_device.address.upper()
+
+    @property
+    def history(self) -> StateHistory:
+        """Get state history, None unless given to the constructor."""
+        return self._history
+
+    @property
+    def state(self) -> dict:
+        """Get last known light and speaker state."""
+        return {
+            'on': self._light.on,
+            'brightness': self._light.brightness,
+            'rgb': self._light.rgb_color,
+            'white': self._light.white,
+            'effect': self._light.effect,
+            'volume': self._speaker.volume,
+            'speaker_effect': self._speaker.effect,
+            'connected': self._connection.is_ready,
+        }
+
+    def add_callback_on_state_changed(self, func: Callable[[], None]) -> None:
+        self._connection.add_callback_on_state_changed(func)
+
     def get_light_effects(self) -> list:
         return [effect.name for effect in Effects]
 
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import struct
+import time
+from typing import Callable, Iterator
+
+from .const import *
+from .protocol import *
+
+_LOGGER = logging.getLogger(__name__)
+
+CAPTURE_MAGIC = b'BSBC\x01'
+
+# monotonic timestamp, direction, payload length
+RECORD = struct.Struct('<dBH')
+
+DIRECTION_WRITE = 0
+DIRECTION_NOTIFY = 1
+DIRECTION_READ = 2
+
+
+class Recorder():
+    """
+    Append frames with monotonic timestamps to a compact binary log
+
+    File: CAPTURE_MAGIC, then records of RECORD followed by the payload
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(CAPTURE_MAGIC)
+
+    def record(self, direction: int, data: bytes) -> None:
+        if self._file is None:
+            return
+        self._file.write(RECORD.pack(time.monotonic(), direction, len(data)))
+        self._file.write(data)
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+
+
+class Replayer():
+    """
+    Read a capture log back
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as f:
+            self._buffer = f.read()
+        if not self._buffer.startswith(CAPTURE_MAGIC):
+            raise ValueError(f"{path} is not a capture log")
+
+    def records(self) -> Iterator[tuple[float, int, bytes]]:
+        """
+        :return: iterator of (timestamp, direction, data)
+        """
+        buffer = self._buffer
+        offset = len(CAPTURE_MAGIC)
+        end = len(buffer)
+        while offset + RECORD.size <= end:
+            ts, direction, length = RECORD.unpack_from(buffer, offset)
+            offset += RECORD.size
+            if offset + length > end:
+                _LOGGER.warning("Replay: truncated record at end of log")
+                return
+            yield ts, direction, buffer[offset:offset + length]
+            offset += length
+
+    def decode(self) -> list:
+        """
+        Feed all received frames through the decoders
+
+        :return: list of decoded frames
+        """
+        return [
+            decode_function(data)
+            for _, direction, data in self.records()
+            if direction != DIRECTION_WRITE
+        ]
+
+    async def replay(self, callback: Callable[[int, bytes], None], speed: float = 1.0) -> None:
+        """
+        Call callback(direction, data) for every record with the original
+        timing divided by speed, speed 0 replays as fast as possible
+        """
+        start = None
+        began = time.monotonic()
+        for ts, direction, data in self.records():
+            if start is None:
+                start = ts
+            if speed:
+                delay = (ts - start) / speed - (time.monotonic() - began)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            callback(direction, data)
+
+
+class ReplayClient():
+    """
+    Simulated BleakClient answering from a capture log
+
+    Every write consumes the next recorded write and plays back the
+    notifications and reads recorded after it. Attach it with
+    Connection.attach_client.
+    """
+
+    def __init__(self, replayer: Replayer, speed: float = 1.0, name: str = "replay") -> None:
+        self._records = list(replayer.records())
+        self._speed = speed
+        self._name = name
+        self._position = 0
+        self._last_read: bytes = None
+        self._notify_cb: Callable = None
+        self.address = "00:00:00:00:00:00"
+        self.is_connected = True
+
+    async def start_notify(self, handle, callback: Callable) -> None:
+        self._notify_cb = callback
+
+    async def disconnect(self) -> bool:
+        self.is_connected = False
+        return True
+
+    async def write_gatt_char(self, char, data, response: bool = False) -> None:
+        records = self._records
+        while self._position < len(records) \
+                and records[self._position][1] != DIRECTION_WRITE:
+            self._position += 1
+        if self._position >= len(records):
+            _LOGGER.debug("Replay: log exhausted")
+            return
+        ts, _, recorded = records[self._position]
+        if bytes(data) != recorded:
+            _LOGGER.debug(f"Replay: wrote {bytes(data).hex()}, log has {recorded.hex()}")
+        self._position += 1
+
+        loop = asyncio.get_running_loop()
+        while self._position < len(records) \
+                and records[self._position][1] != DIRECTION_WRITE:
+            at, direction, answer = records[self._position]
+            self._position += 1
+            if direction == DIRECTION_READ:
+                self._last_read = answer
+            elif self._notify_cb is not None:
+                delay = (at - ts) / self._speed if self._speed else 0
+                loop.call_later(delay, self._notify_cb, 0, bytearray(answer))
+
+    async def read_gatt_char(self, char, **kwargs) -> bytearray:
+        if char == UUID_CHARACTERISTIC.UUID_CHARACTERISTIC_DEVICE_NAME.value:
+            return bytearray(self._name.encode('utf-8'))
+        return bytearray(self._last_read or b'')
@@ -0,0 +1,146 @@
+"""
+Vectorized color conversion and frame encoding for effects and scenes
+
+Every function takes whole arrays of colors, the leading dimensions are
+kept, e.g. hsv of shape (bulbs, steps, 3) gives rgb of shape (bulbs, steps, 3).
+
+Requires NumPy (pip install bluetooth_speaker_bulb[numpy]).
+"""
+import numpy as np
+
+from .const import *
+from .protocol import FRAME_OVERHEAD, HEADER
+
+# Color temperature range of the white leds
+KELVIN_WARM = 2700
+KELVIN_COLD = 6500
+
+
+def gamma_table(gamma: float = 2.2) -> np.ndarray:
+    """
+    Lookup table from linear 0..255 to gamma corrected 0..255
+
+    :param gamma: gamma exponent
+    :return: uint8 array of 256 values, use as table[values]
+    """
+    return np.round(255 * (np.arange(256) / 255) ** gamma).astype(np.uint8)
+
+
+def hsv_to_rgb(hsv) -> np.ndarray:
+    """
+    Convert HSV colors to rgb
+
+    :param hsv: array (..., 3) of hue 0..360, saturation and value 0..1
+    :return: uint8 array (..., 3)
+    """
+    hsv = np.asarray(hsv, dtype=np.float64)
+    h = (hsv[..., 0] % 360) / 60
+    s = np.clip(hsv[..., 1], 0, 1)
+    v = np.clip(hsv[..., 2], 0, 1)
+    # distance of every channel to its hue sector, r at 5, g at 3 and b at 1
+    k = (np.array([5, 3, 1]) + h[..., None]) % 6
+    rgb = v[..., None] * (1 - s[..., None] * np.clip(np.minimum(k, 4 - k), 0, 1))
+    return np.round(rgb * 255).astype(np.uint8)
+
+
+def kelvin_to_white(kelvin) -> np.ndarray:
+    """
+    Convert color temperatures to the cold and warm white channels, the
+    bulb keeps cold + warm at 255 so the cold channel is the white intensity
+
+    :param kelvin: array of color temperatures, clipped to KELVIN_WARM..KELVIN_COLD
+    :return: uint8 array (..., 2) of cold, warm
+    """
+    kelvin = np.clip(np.asarray(kelvin, dtype=np.float64), KELVIN_WARM, KELVIN_COLD)
+    cold = np.round((kelvin - KELVIN_WARM) / (KELVIN_COLD - KELVIN_WARM) * 255)
+    return np.stack([cold, 255 - cold], axis=-1).astype(np.uint8)
+
+
+def kelvin_to_rgb(kelvin) -> np.ndarray:
+    """
+    Approximate color temperatures with the rgb leds (black body fit, 1000..40000 K)
+
+    :param kelvin: array of color temperatures
+    :return: uint8 array (..., 3)
+    """
+    t = np.clip(np.asarray(kelvin, dtype=np.float64), 1000, 40000) / 100
+    warm = t <= 66
+    r = np.where(warm, 255, 329.698727446 * np.maximum(t - 60, 1e-9) ** -0.1332047592)
+    g = np.where(warm,
+                 99.4708025861 * np.log(t) - 161.1195681661,
+                 288.1221695283 * np.maximum(t - 60, 1e-9) ** -0.0755148492)
+    b = np.where(t >= 66, 255,
+                 np.where(t <= 19, 0, 138.5177312231 * np.log(np.maximum(t - 10, 1)) - 305.0447927307))
+    return np.round(np.clip(np.stack([r, g, b], axis=-1), 0, 255)).astype(np.uint8)
+
+
+def gradient(palette, steps: int, cyclic: bool = False) -> np.ndarray:
+    """
+    Linear interpolation through a palette of rgb colors
+
+    :param palette: array (colors, 3)
+    :param steps: number of output colors
+    :param cyclic: interpolate back to the first color, for looping effects
+    :return: uint8 array (steps, 3)
+    """
+    palette = np.asarray(palette, dtype=np.float64)
+    if cyclic:
+        palette = np.concatenate([palette, palette[:1]])
+    stops = np.linspace(0, len(palette) - 1, len(palette))
+    position = np.linspace(0, len(palette) - 1, steps, endpoint=not cyclic)
+    rgb = np.stack([np.interp(position, stops, palette[:, c]) for c in range(3)], axis=-1)
+    return np.round(rgb).astype(np.uint8)
+
+
+def encode_frames(category: int, function: int, data) -> np.ndarray:
+    """
+    Encode a batch of messages with the same category, function and data
+    length, the vectorized form of encode_msg
+
+    :param category: category to use
+    :param function: function to use
+    :param data: array (..., length) of data bytes
+    :return: uint8 array (..., length + FRAME_OVERHEAD), one frame per row
+    """
+    data = np.asarray(data)
+    if data.size and (data.min() < 0 or data.max() > 255):
+        raise ValueError("data must be in 0..255")
+    length = data.shape[-1]
+    frames = np.empty(data.shape[:-1] + (length + FRAME_OVERHEAD,), dtype=np.uint8)
+    frames[..., :5] = (*HEADER, length, category, function)
+    frames[..., 5:-1] = data
+    # encode_checksum: (-(sum + 1)) mod 256
+    frames[..., -1] = (-(frames[..., :-1].sum(axis=-1, dtype=np.int64) + 1)) % 256
+    return frames
+
+
+def encode_rgb_frames(rgb) -> np.ndarray:
+    """
+    Color frames for N bulbs x T steps
+
+    :param rgb: array (..., 3)
+    :return: uint8 array (..., 9)
+    """
+    return encode_frames(SetBulbCategory.light.value, SetLightFunction.color.value, rgb)
+
+
+def encode_white_frames(kelvin) -> np.ndarray:
+    """
+    White intensity frames for N bulbs x T steps
+
+    :param kelvin: array of color temperatures
+    :return: uint8 array (..., 7)
+    """
+    cold = np.maximum(kelvin_to_white(kelvin)[..., :1], 1)
+    return encode_frames(SetBulbCategory.light.value, SetLightFunction.white_intensity.value, cold)
+
+
+def encode_brightness_frames(brightness) -> np.ndarray:
+    """
+    Brightness frames for N bulbs x T steps
+
+    :param brightness: array of brightness 0..255
+    :return: uint8 array (..., 7)
+    """
+    return encode_frames(SetBulbCategory.light.value, SetLightFunction.brightness.value,
+                         np.asarray(brightness)[..., None])
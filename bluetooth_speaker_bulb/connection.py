@@ -1,6 +1,8 @@
 import asyncio
 import functools
+import inspect
 import logging
+import random
 from enum import Enum
 from typing import Any, Callable
 from uuid import UUID
@@ -10,7 +12,13 @@ from bleak.backends.client import BaseBleakClient
 from bleak.backends.device import BLEDevice
 from bleak_retry_connector import establish_connection
 
+from .adapters import RSSI_UNKNOWN
+from .breaker import CircuitBreaker
+from .capture import (DIRECTION_NOTIFY, DIRECTION_READ, DIRECTION_WRITE,
+                      Recorder)
 from .const import *
+from .lanes import Lane, LaneScheduler
+from .pacing import Pacer
 from .protocol import *
 
 _LOGGER = logging.getLogger(__name__)
@@ -20,8 +28,18 @@ CONTROL_UUID: UUID = "0000a040-0000-1000-8000-00805f9b34fb"
 NAME_UUID: UUID = "00002a00-0000-1000-8000-00805f9b34fb"
 NOTIFY_HANDLE: hex = 0x8
 
-MODEL_BLUETOOTH_SPEAKER_BULB = "bluetooth_speaker_bulb"
-MODEL_UNKNOWN = "Unknown"
+# Background supervisor, reconnect backoff in seconds
+RECONNECT_BACKOFF_MIN: float = 0.5
+RECONNECT_BACKOFF_MAX: float = 60.0
+KEEPALIVE_INTERVAL: float = 30.0
+
+# Time to wait for notifications of a pipelined batch
+BATCH_TIMEOUT: float = 2.0
+# Longest wait for the disconnect callback after a disconnect
+DISCONNECT_TIMEOUT: float = 2.0
+
+# bleak 0.19 to 0.22 require the RSSI when building a BLEDevice, 1.0 dropped it
+_BLE_DEVICE_RSSI = 'rssi' in inspect.signature(BLEDevice.__init__).parameters
 
 
 class Conn(Enum):
@@ -29,19 +47,34 @@ class Conn(Enum):
     DISCONNECTED = 1
 
 
-def model_from_name(ble_name: str) -> str:
-    model = MODEL_UNKNOWN
-    if ble_name.startswith("bluetooth_speaker_bulb"):
-        model = MODEL_BLUETOOTH_SPEAKER_BULB
-    return model
+def make_ble_device(address: str, name: str | None, details: Any = None,
+                    rssi: int = RSSI_UNKNOWN) -> BLEDevice:
+    """
+    Build a BLEDevice without scanning, on any supported bleak version
+
+    :param address: mac address
+    :param name: device name
+    :param details: backend details, for BlueZ {'path': ..., 'props': {}}
+    :param rssi: RSSI, passed only to bleak versions that take it
+    """
+    if _BLE_DEVICE_RSSI:
+        return BLEDevice(address, name, details, rssi)
+    return BLEDevice(address, name, details)
 
 
 async def find_device_by_address(
-    address: str, timeout: float = 20.0
+    address: str, timeout: float = 20.0, scanner=None
 ) -> BLEDevice:
-    from bleak import BleakScanner
+    """
+    Look up a device, answered from the scanner index when it has been
+    seen recently, so many lookups share one running scan.
+
+    :param scanner: BulbScanner to use, defaults to the shared one
+    """
+    from .scanner import shared_scanner
 
-    return await BleakScanner.find_device_by_address(address.upper(), timeout=timeout)
+    scanner = scanner if scanner is not None else shared_scanner()
+    return await scanner.find_device_by_address(address, timeout=timeout)
 
 
 async def discover_bluetooth_speaker_bulb_lamps(
@@ -66,7 +99,9 @@ async def discover_bluetooth_speaker_bulb_lamps(
 
 
 class Connection():
-    def __init__(self, ble_device: BLEDevice, timeout: int, retries: int) -> None:
+    def __init__(self, ble_device: BLEDevice, timeout: int, retries: int,
+                 failure_threshold: int = 3, cool_down: float = 30.0,
+                 scheduler=None) -> None:
         self._client: BleakClient | None = None
         self._ble_device = ble_device
         self._mac = self._ble_device.address
@@ -75,8 +110,25 @@ class Connection():
         )
         self._timeout = timeout
         self._retries = retries
+        self._breaker = CircuitBreaker(
+            self._mac, failure_threshold=failure_threshold, cool_down=cool_down)
         self._state_callbacks: list[Callable[[], None]] = []
         self._read_service = False
+        self._handles: dict[str, int] = {}
+        self._pending: dict[tuple[int, int], asyncio.Future] = {}
+        self._recorder: Recorder | None = None
+        self._scheduler = scheduler
+        self._adapter: str | None = None
+        if scheduler is not None:
+            scheduler.register(self)
+        self._supervisor: asyncio.Task | None = None
+        self._ready = asyncio.Event()
+        self._reconnect = asyncio.Event()
+        self._reconnecting = False
+        self._disconnected = asyncio.Event()
+        self._disconnecting = False
+        self._pacer = Pacer(self._mac)
+        self._lanes = LaneScheduler(self._mac)
 
     def add_callback_on_state_changed(self, func: Callable[[], None]) -> None:
         """
@@ -95,21 +147,131 @@ class Connection():
             return
         _LOGGER.debug(
             f"Client with address {client.address} got disconnected!")
+        self._ready.clear()
+        self._disconnected.set()
+        if self._scheduler is not None:
+            self._scheduler.release(self._mac)
+        if self._supervisor is not None and not self._disconnecting:
+            self._reconnect.set()
         self.run_state_changed_cb()
 
-    async def connect(self, num_tries: int = 3) -> None:
+    @property
+    def is_ready(self) -> bool:
+        """Connected and notifications are set up"""
+        return self._ready.is_set()
+
+    @property
+    def supervised(self) -> bool:
+        """Get whether the background supervisor keeps the link up."""
+        return self._supervisor is not None and not self._supervisor.done()
+
+    def start_supervisor(self) -> None:
+        """
+        Start a background task that keeps the link alive and reconnects
+        with exponential backoff when the bulb drops
+        """
+        if self._supervisor is not None and not self._supervisor.done():
+            return
+        self._supervisor = asyncio.create_task(self._supervise())
+        if not self._ready.is_set():
+            self._reconnect.set()
+
+    async def stop_supervisor(self) -> None:
+        """Stop the background supervisor, the link is left as it is"""
+        if self._supervisor is None:
+            return
+        self._supervisor.cancel()
+        try:
+            await self._supervisor
+        except asyncio.CancelledError:
+            pass
+        self._supervisor = None
+
+    async def _supervise(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._reconnect.wait(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                # keepalive, the disconnect callback is not always delivered
+                if self._client is not None and self._client.is_connected:
+                    continue
+                self._ready.clear()
+            self._reconnect.clear()
+            if self._ready.is_set():
+                # asked while the last reconnect was running, the link is up
+                continue
+
+            self._reconnecting = True
+            try:
+                attempt = 0
+                while not await self.connect():
+                    delay = min(RECONNECT_BACKOFF_MAX,
+                                RECONNECT_BACKOFF_MIN * 2 ** attempt)
+                    attempt += 1
+                    # full jitter so a fleet does not reconnect in lockstep
+                    delay = random.uniform(0, delay)
+                    _LOGGER.debug(
+                        f"Supervisor: reconnect {self._mac} failed, retry in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+            finally:
+                self._reconnecting = False
+            _LOGGER.debug(f"Supervisor: {self._mac} reconnected")
+
+    async def ensure_connected(self) -> bool:
+        """
+        Make sure the link is usable before a command is sent.
+        With a running supervisor the command waits for the background
+        reconnect instead of connecting inline.
+        """
+        if self._supervisor is not None and not self._supervisor.done():
+            if not self._ready.is_set():
+                if not self._reconnecting:
+                    self._reconnect.set()
+                try:
+                    await asyncio.wait_for(self._ready.wait(), self._timeout)
+                except asyncio.TimeoutError:
+                    _LOGGER.error(f"Connection {self._mac} not ready in time")
+                    return False
+            return True
+        if await self.test_connection():
+            return True
+        return await self.connect()
+
+    def _link_lost(self) -> None:
+        self._ready.clear()
+        if self._supervisor is not None and not self._reconnecting:
+            self._reconnect.set()
+
+    async def connect(self, num_tries: int = 3) -> bool:
         _LOGGER.debug("Initiating new connection")
+        self._ready.clear()
         try:
             if self._client:
-                await self.disconnect()
+                if self._client.is_connected:
+                    await self.disconnect()
+                else:
+                    # link already gone, skip the disconnect settle time
+                    self._client = None
+
+            device = self._ble_device
+            kwargs = {}
+            if self._scheduler is not None:
+                self._adapter, device = self._scheduler.assign(
+                    self._mac, self._ble_device)
+                if self._adapter is not None:
+                    kwargs['adapter'] = self._adapter
 
             _LOGGER.debug("Connecting now:...")
-            self._client = await establish_connection(
-                BleakClient,
-                device=self._ble_device,
-                name=self._mac,
-                disconnected_callback=self.diconnected_cb,
-                max_attempts=3,
+            self._client = await asyncio.wait_for(
+                establish_connection(
+                    BleakClient,
+                    device=device,
+                    name=self._mac,
+                    disconnected_callback=self.diconnected_cb,
+                    max_attempts=self._retries,
+                    **kwargs
+                ),
+                self._timeout
             )
             _LOGGER.debug(f"Connected: {self._client.is_connected}")
 
@@ -122,30 +284,117 @@ class Connection():
             _LOGGER.debug("Request Notify")
             await self._client.start_notify(NOTIFY_HANDLE, self.notification_handler)
             await asyncio.sleep(0.3)
-            await self.get_services()
+            self._cache_handles()
 
             _LOGGER.debug(f"Connection status: Connected")
+            self._breaker.record_success()
+            self._ready.set()
+            return True
 
         except asyncio.TimeoutError:
             _LOGGER.error("Connection Timeout error")
         except BleakError as err:
             _LOGGER.error(f"Connection: BleakError: {err}")
+        if self._scheduler is not None:
+            self._scheduler.release(self._mac)
+        return False
+
+    async def attach_client(self, client) -> bool:
+        """
+        Use an already connected client, e.g. a simulated one, instead of
+        connecting over BLE
+
+        :param client: object with the BleakClient methods used here
+        """
+        self._client = client
+        await self._client.start_notify(NOTIFY_HANDLE, self.notification_handler)
+        self._ready.set()
+        return True
+
+    def start_recording(self, path: str) -> None:
+        """
+        Record every written frame and received notification to a capture log
+
+        :param path: capture log, appended to if it exists
+        """
+        self.stop_recording()
+        self._recorder = Recorder(path)
+
+    def stop_recording(self) -> None:
+        if self._recorder is None:
+            return
+        self._recorder.close()
+        self._recorder = None
 
     async def disconnect(self) -> None:
         if self._client is None:
             return
+        self._ready.clear()
+        self._disconnecting = True
+        self._disconnected.clear()
         try:
             await self._client.disconnect()
-            await asyncio.sleep(2.0)
+            # settled once the disconnect callback arrives
+            await asyncio.wait_for(self._disconnected.wait(), DISCONNECT_TIMEOUT)
         except asyncio.TimeoutError:
-            _LOGGER.error("Disconnection: Timeout error")
+            _LOGGER.debug("Disconnection: no disconnect callback")
         except BleakError as err:
             _LOGGER.error(f"Disconnection: BleakError: {err}")
+        finally:
+            self._disconnecting = False
         self._client = None
+        if self._scheduler is not None:
+            self._scheduler.release(self._mac)
+
+    @property
+    def adapter(self) -> str | None:
+        """Get adapter the link was placed on, None for the default adapter."""
+        return self._adapter
+
+    def _cache_handles(self) -> None:
+        """Remember the GATT handles of the control and receive characteristics"""
+        services = self._client.services if self._client else None
+        if not services:
+            return
+        for uuid in (CONTROL_UUID, RECIVE_UUID):
+            char = services.get_characteristic(uuid)
+            if char is not None:
+                self._handles[uuid] = char.handle
+
+    @property
+    def handles(self) -> dict[str, int]:
+        """Get cached GATT handles."""
+        return dict(self._handles)
+
+    @handles.setter
+    def handles(self, handles: dict[str, int]) -> None:
+        self._handles = dict(handles)
+
+    @property
+    def lanes(self) -> LaneScheduler:
+        """Get command lanes, see LaneScheduler.metrics."""
+        return self._lanes
+
+    @property
+    def pacer(self) -> Pacer:
+        """Get write pacing."""
+        return self._pacer
+
+    @property
+    def ble_device(self) -> BLEDevice:
+        """Get BLE device."""
+        return self._ble_device
 
     def notification_handler(self, sender, data):
-        """Simple notification handler which prints the data received."""
-        print("Notification {0}: {1}".format(sender, data))
+        """Notification handler, resolves pending batch requests."""
+        _LOGGER.debug(f"Notification {sender}: {data}")
+        if self._recorder is not None:
+            self._recorder.record(DIRECTION_NOTIFY, bytes(data))
+        if len(data) > 4:
+            self._pacer.notified(data[3])
+            future = self._pending.get((data[3], data[4]))
+            if future is not None and not future.done():
+                future.set_result(bytes(data))
         self.run_state_changed_cb()
 
     async def get_services(self) -> None:
@@ -164,40 +413,91 @@ class Connection():
         buffer: bytearray = await self._client.read_gatt_char(NAME_UUID, respone=True)
         return buffer.decode('utf-8')
 
-    async def get_category_info(self, category, functions) -> list:
+    async def get_category_info(self, category, functions,
+                                lane: Lane = Lane.BACKGROUND) -> list:
         """
         Retrieve category in from all functions.
 
         :param category: category to retrieve info from
         :param functions: functions to retrieve info from
+        :param lane: lane of the requests
         """
         buffer_list = []
         for func in functions:
             msg = encode_msg(category.value,
                              func.value,
                              Commands.REQ_DATA.value)
-            await self.send_cmd(msg)
-            buffer = await self.read_cmd()
-            if buffer:
+            # request and read back hold the link together
+            async with self._lanes.slot(lane):
+                await self.send_cmd(msg)
+                buffer = await self.read_cmd()
+            decoded = decode_function(buffer) if buffer else []
+            if decoded:
                 _LOGGER.debug(
                     f"Connection get_category_info, buffer: {buffer}")
-                buffer_list.append(decode_function(buffer))
+                buffer_list.append(decoded)
             else:
+                # empty or malformed, a partial result would break the models
                 _LOGGER.debug(
-                    f"Connection get_category_info, buffer empty, buffer {buffer}")
+                    f"Connection get_category_info, no valid answer, buffer {buffer}")
                 buffer_list = None
                 break
 
         self.run_state_changed_cb()
         return buffer_list
 
+    async def get_category_info_batch(self, category, functions,
+                                      lane: Lane = Lane.BACKGROUND) -> list:
+        """
+        Pipelined get_category_info, all requests are written back to back
+        and the answers are collected from notifications. Functions that
+        did not answer in time are read one by one.
+
+        :param category: category to retrieve info from
+        :param functions: functions to retrieve info from
+        :param lane: lane of the requests
+        """
+        functions = list(functions)
+        loop = asyncio.get_running_loop()
+        get_category = GetBulbCategory[category.name].value
+        futures = {}
+        for func in functions:
+            key = (get_category, func.value)
+            futures[func] = self._pending[key] = loop.create_future()
+        try:
+            async with self._lanes.slot(lane):
+                for func in functions:
+                    msg = encode_msg(category.value,
+                                     func.value,
+                                     Commands.REQ_DATA.value)
+                    if not await self.send_cmd(msg, wait_notif=0):
+                        return None
+                await asyncio.wait(futures.values(), timeout=BATCH_TIMEOUT)
+        finally:
+            for func in functions:
+                self._pending.pop((get_category, func.value), None)
+
+        decoded = {f: decode_function(futures[f].result())
+                   for f in functions if futures[f].done()}
+        missing = [f for f in functions if not decoded.get(f)]
+        if missing:
+            self._pacer.record_drop()
+            _LOGGER.debug(
+                f"Connection get_category_info_batch, no valid notification for {missing}")
+            buffer_list = await self.get_category_info(category, missing, lane=lane)
+            if buffer_list is None:
+                return None
+            decoded.update(zip(missing, buffer_list))
+
+        self.run_state_changed_cb()
+        return [decoded[f] for f in functions]
+
     async def test_connection(self) -> bool:
         _LOGGER.debug("Test Connection")
         if self._client:
             if self._client.is_connected:
                 try:
                     await self.get_device_name()
-                    await asyncio.sleep(0.1)
                     return True
                 except asyncio.TimeoutError:
                     _LOGGER.error("Test Connection: Timeout error")
@@ -208,29 +508,97 @@ class Connection():
             await self.disconnect()
         return False
 
-    async def send_cmd(self, msg: bytearray, UUID: UUID = CONTROL_UUID, wait_notif: float = 0.5) -> bool:
-        if not await self.test_connection():
-            await self.connect()
+    @property
+    def breaker(self) -> CircuitBreaker:
+        """Get circuit breaker."""
+        return self._breaker
+
+    async def _with_deadline(self, name: str, coro) -> Any:
+        """
+        Run one operation through the circuit breaker within the timeout
+        budget, fail fast while the breaker is open.
+
+        :param name: operation name for logging
+        :param coro: coroutine doing the operation
+        :return: result of the operation, None on failure
+        """
+        if not self._breaker.allow():
+            coro.close()
+            _LOGGER.debug(f"{name}: {self._mac} unreachable, failing fast")
+            return None
+        result = None
+        try:
+            result = await asyncio.wait_for(coro, self._timeout)
+        except asyncio.TimeoutError:
+            _LOGGER.error(f"{name}: {self._mac} deadline exceeded")
+            self._link_lost()
+        except asyncio.CancelledError:
+            # says nothing about the bulb, but a half-open probe must not stay taken
+            self._breaker.record_cancelled()
+            raise
+        if result:
+            self._breaker.record_success()
+        else:
+            self._breaker.record_failure()
+        return result
+
+    async def send_cmd(self, msg: bytearray, UUID: UUID = CONTROL_UUID, wait_notif: float = None,
+                       lane: Lane = Lane.INTERACTIVE) -> bool:
+        """
+        Write a frame, paced by the bulb's learned processing time
+
+        :param msg: encoded frame
+        :param wait_notif: seconds to sleep after the write instead of waiting
+            for the answer to the previous write before it, the write
+            spacing is kept either way
+        :param lane: lane to queue the write in
+        """
+        async with self._lanes.slot(lane):
+            return bool(await self._with_deadline(
+                "Send Cmd", self._send_cmd(msg, UUID, wait_notif)))
+
+    async def read_cmd(self, UUID: UUID = RECIVE_UUID, lane: Lane = Lane.INTERACTIVE) -> bytearray:
+        async with self._lanes.slot(lane):
+            return await self._with_deadline("Read Cmd", self._read_cmd(UUID))
+
+    async def _send_cmd(self, msg: bytearray, UUID: UUID, wait_notif: float) -> bool:
+        if not await self.ensure_connected():
+            return False
         try:
-            await self._client.write_gatt_char(UUID, msg, response=True)
-            await asyncio.sleep(wait_notif)
+            await self._pacer.wait(ack=wait_notif is None)
+            await self._client.write_gatt_char(
+                self._handles.get(UUID, UUID), msg, response=True)
+            if len(msg) >= FRAME_OVERHEAD:
+                self._pacer.wrote(
+                    msg[3], request=msg[5:-1] == bytes([Commands.REQ_DATA.value]))
+            if self._recorder is not None:
+                self._recorder.record(DIRECTION_WRITE, bytes(msg))
+            if wait_notif:
+                await asyncio.sleep(wait_notif)
             return True
         except asyncio.TimeoutError:
             _LOGGER.error("Send Cmd: Timeout error")
         except BleakError as err:
             _LOGGER.error(f"Send Cmd: BleakError: {err}")
+            self._link_lost()
         return False
 
-    async def read_cmd(self, UUID: UUID = RECIVE_UUID) -> bytearray:
-        if not await self.test_connection():
-            await self.connect()
+    async def _read_cmd(self, UUID: UUID) -> bytearray:
+        if not await self.ensure_connected():
+            return None
         try:
-            return await self._client.read_gatt_char(UUID, respone=True)
+            # the answer to the request is ready once it was notified
+            await self._pacer.wait()
+            buffer = await self._client.read_gatt_char(
+                self._handles.get(UUID, UUID), respone=True)
+            if self._recorder is not None and buffer:
+                self._recorder.record(DIRECTION_READ, bytes(buffer))
+            return buffer
         except asyncio.TimeoutError:
             _LOGGER.error("Read Cmd: Timeout error")
         except BleakError as err:
-            self.disconnect()
             _LOGGER.error(f"Read Cmd: BleakError: {err}")
+            self._link_lost()
 
     async def find_device_by_address(
         address: str, timeout: float = 20.0
@@ -1,5 +1,15 @@
 from enum import Enum
 
+MODEL_BLUETOOTH_SPEAKER_BULB = "bluetooth_speaker_bulb"
+MODEL_UNKNOWN = "Unknown"
+
+
+def model_from_name(ble_name: str) -> str:
+    model = MODEL_UNKNOWN
+    if ble_name and ble_name.startswith("bluetooth_speaker_bulb"):
+        model = MODEL_BLUETOOTH_SPEAKER_BULB
+    return model
+
 
 class UUID_CHARACTERISTIC(Enum):
     """
@@ -0,0 +1,114 @@
+"""
+Energy and usage estimate from recorded state history
+
+Requires NumPy (pip install bluetooth_speaker_bulb[numpy]).
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+from .const import MODEL_BLUETOOTH_SPEAKER_BULB, MODEL_UNKNOWN
+from .history import HISTORY_FIELDS, StateHistory
+
+
+class PowerModel(NamedTuple):
+    """
+    Power calibration of a bulb model, in watts
+    """
+    standby: float
+    led_max: float
+    speaker_max: float
+
+
+# model from model_from_name: calibration
+POWER_MODELS = {
+    MODEL_BLUETOOTH_SPEAKER_BULB: PowerModel(standby=0.4, led_max=6.0, speaker_max=3.0),
+    MODEL_UNKNOWN: PowerModel(standby=0.5, led_max=7.0, speaker_max=3.0),
+}
+
+
+class EnergyEstimator():
+    """
+    Integrates a power model over the state histories of a whole fleet.
+
+    Light power is led_max scaled by brightness and by the channel load,
+    the white channels when white is on, otherwise rgb. The bulb keeps
+    cold + warm at 255, so full white is a load of 1.
+    Speaker power is speaker_max scaled by volume (0..100).
+    """
+
+    def __init__(self, calibration: dict[str, PowerModel] = None) -> None:
+        """
+        :param calibration: model to PowerModel, overrides POWER_MODELS
+        """
+        self._calibration = dict(POWER_MODELS)
+        self._calibration.update(calibration or {})
+
+    def loads(self, columns: dict[str, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Light and speaker load of every sample, 0..1 of led_max and speaker_max
+
+        :param columns: field to array
+        """
+        white = columns['cold'] + columns['warm'].astype(np.float64)
+        rgb = columns['r'] + columns['g'].astype(np.float64) + columns['b']
+        load = np.where(white > 0, np.minimum(white * (1 / 255), 1), rgb * (1 / 765))
+        load *= columns['brightness']
+        load *= columns['on'] * (1 / 255)
+        return load, columns['volume'] * (1 / 100)
+
+    def estimate(self, histories: dict[str, StateHistory], start: float, end: float,
+                 models: dict[str, str] = None) -> dict[str, dict[str, float]]:
+        """
+        Energy use of every bulb over [start, end)
+
+        :param histories: mac to StateHistory
+        :param start: window start, unix time
+        :param end: window end, unix time
+        :param models: mac to model from model_from_name, default MODEL_UNKNOWN
+        :return: mac to {'wh': energy in Wh, 'watts': average power, 'on_hours': uptime}
+        """
+        models = models or {}
+        macs = list(histories)
+        per_device = [histories[mac].columns() for mac in macs]
+        lengths = np.fromiter((len(c['timestamp']) for c in per_device), np.int64, len(macs))
+        if not lengths.sum():
+            return {mac: {'wh': 0.0, 'watts': 0.0, 'on_hours': 0.0} for mac in macs}
+
+        # one flat array per field for the whole fleet
+        columns = {
+            field: np.concatenate([np.frombuffer(c[field], dtype=c[field].typecode)
+                                   for c in per_device])
+            for field in ('timestamp', *HISTORY_FIELDS)
+        }
+        device = np.repeat(np.arange(len(macs)), lengths)
+
+        # every sample holds until the next sample of the same device, or the window end
+        timestamps = columns['timestamp']
+        following = np.empty_like(timestamps)
+        following[:-1] = timestamps[1:]
+        following[np.cumsum(lengths)[lengths > 0] - 1] = end
+        np.minimum(following, end, out=following)
+        duration = following - np.maximum(timestamps, start)
+        np.maximum(duration, 0, out=duration)
+
+        # the model is linear, so sum the loads per device first and apply
+        # the per device calibration to the sums
+        light, speaker = self.loads(columns)
+        count = len(macs)
+        covered = np.bincount(device, weights=duration, minlength=count)
+        light = np.bincount(device, weights=light * duration, minlength=count)
+        speaker = np.bincount(device, weights=speaker * duration, minlength=count)
+        on = np.bincount(device, weights=columns['on'] * duration, minlength=count)
+
+        params = np.array([
+            self._calibration.get(models.get(mac, MODEL_UNKNOWN), self._calibration[MODEL_UNKNOWN])
+            for mac in macs
+        ], dtype=np.float64)
+        joules = params[:, 0] * covered + params[:, 1] * light + params[:, 2] * speaker
+        watts = np.divide(joules, covered, out=np.zeros_like(joules), where=covered > 0)
+        return {
+            mac: {'wh': float(joules[i] / 3600), 'watts': float(watts[i]),
+                  'on_hours': float(on[i] / 3600)}
+            for i, mac in enumerate(macs)
+        }
@@ -0,0 +1,453 @@
+"""
+Sharded fleet runner, bulbs split across worker processes
+
+    python -m bluetooth_speaker_bulb.fleet --registry bulbs.jsonl --shards 4
+    python -m bluetooth_speaker_bulb.fleet --registry bulbs.jsonl --adapters hci0 hci1
+
+Each worker process runs its own event loop and Bulb set. Bulbs go to a
+shard by a stable hash of their mac. With --adapters every shard owns a
+share of the adapters, bulbs go to the shard owning the adapter that
+heard them best (RSSI per adapter from the registry) and connect through
+that shard's adapters only. Workers push the RSSI they hear back to the
+front end, which saves it to the registry for the next start.
+
+The front end talks to the workers over pipes: commands are routed to the
+shard owning the bulb, state changes are pushed back in coalesced batches
+and aggregated.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import zlib
+from typing import Any, Callable
+
+from .bulb import METHODS
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds between state batches from a worker
+STATE_INTERVAL: float = 0.05
+# Seconds between RSSI batches from a worker, the front end saves them to the registry
+RSSI_INTERVAL: float = 10.0
+
+# Seconds to flush queued messages when a pipe end closes
+STOP_FLUSH: float = 1.0
+
+# Errors passed back to the caller as themselves, anything else is a RuntimeError
+_ERRORS = {err.__name__: err for err in (TypeError, KeyError, ValueError)}
+
+
+def shard_of(address: str, shards: int) -> int:
+    """
+    Shard of a bulb, stable across processes and restarts
+
+    :param address: mac address
+    :param shards: number of shards
+    """
+    return zlib.crc32(address.upper().encode()) % shards
+
+
+def plan_shards(addresses: list[str], shards: int, adapters: list[str] = None,
+                rssi: dict[str, dict[str, int]] = None) -> list[dict[str, list[str]]]:
+    """
+    Split bulbs, and adapters if given, across shards
+
+    :param addresses: mac addresses
+    :param shards: number of shards, at most one per adapter when adapters are given
+    :param adapters: adapter names, hci0, hci1, ...
+    :param rssi: mac to adapter to RSSI, a bulb goes to the shard owning its
+        strongest adapter, bulbs without a reading are placed by mac hash
+    :return: per shard {'addresses': [...], 'adapters': [...]}
+    """
+    if adapters:
+        shards = min(shards, len(adapters))
+    plan = [{'addresses': [], 'adapters': list(adapters[i::shards]) if adapters else []}
+            for i in range(shards)]
+    owner = {adapter: i % shards for i, adapter in enumerate(adapters or [])}
+    for address in addresses:
+        address = address.upper()
+        heard = {a: r for a, r in (rssi or {}).get(address, {}).items() if a in owner}
+        shard = owner[max(heard, key=heard.get)] if heard else shard_of(address, shards)
+        plan[shard]['addresses'].append(address)
+    return plan
+
+
+async def _create_bulbs(spec: dict, on_advertisement: Callable = None) -> dict:
+    from .bulb import Bulb
+
+    bulbs = {}
+    if spec.get('simulate') is not None:
+        from .simulator import create_simulated_bulb
+        for address in spec['addresses']:
+            bulbs[address] = await create_simulated_bulb(address, latency=spec['simulate'])
+        return bulbs
+
+    from .registry import Registry
+    registry = Registry(spec['registry'])
+    scheduler = None
+    if spec['adapters']:
+        from .adapters import AdapterScheduler
+        from .scanner import BulbScanner
+        # the shard's adapters only, the default one may belong to another worker
+        scheduler = AdapterScheduler(spec['adapters'], restrict=True)
+        for adapter in spec['adapters']:
+            scanner = BulbScanner(adapter=adapter)
+            scanner.add_callback_on_advertisement(scheduler.on_advertisement)
+            if on_advertisement is not None:
+                scanner.add_callback_on_advertisement(on_advertisement)
+            await scanner.start()
+        scheduler.start()
+    for address in spec['addresses']:
+        bulb = Bulb.from_registry(registry, address, refresh=False, scheduler=scheduler)
+        if bulb is None:
+            _LOGGER.warning(f"Fleet: {address} not in registry")
+            continue
+        bulb.start_keepalive()
+        bulbs[address] = bulb
+    return bulbs
+
+
+class _Sender():
+    """
+    Writes messages to a pipe from its own thread, a full pipe blocks that
+    thread while the event loop keeps reading, so two ends writing to each
+    other at once cannot deadlock
+    """
+
+    def __init__(self, conn, name: str, on_error: Callable[[], None]) -> None:
+        """
+        :param conn: multiprocessing connection
+        :param name: thread name
+        :param on_error: called on the loop when a write fails, the other end is gone
+        """
+        self._conn = conn
+        self._loop = asyncio.get_running_loop()
+        self._on_error = on_error
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def send(self, message: tuple) -> None:
+        """Queue a message, never blocks"""
+        self._queue.put(message)
+
+    def close(self, timeout: float = None) -> None:
+        """Write what is queued and stop the thread, blocks"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while (message := self._queue.get()) is not None:
+            try:
+                self._conn.send(message)
+            except (OSError, ValueError):
+                try:
+                    self._loop.call_soon_threadsafe(self._on_error)
+                except RuntimeError:
+                    # loop already closed
+                    pass
+                return
+
+
+async def _serve(conn, spec: dict) -> None:
+    loop = asyncio.get_running_loop()
+    # (mac, adapter) to last RSSI, pushed to the front end every RSSI_INTERVAL
+    heard: dict[tuple[str, str], int] = {}
+
+    def on_advertisement(device, rssi: int, adapter: str) -> None:
+        heard[(device.address.upper(), adapter)] = rssi
+
+    bulbs = await _create_bulbs(spec, on_advertisement)
+    stopped = loop.create_future()
+    dirty: set[str] = set(bulbs)
+    tasks = set()
+
+    def front_end_gone() -> None:
+        if not stopped.done():
+            stopped.set_result(None)
+
+    sender = _Sender(conn, f"fleet-sender-{os.getpid()}", front_end_gone)
+
+    for mac, bulb in bulbs.items():
+        bulb.add_callback_on_state_changed(lambda mac=mac: dirty.add(mac))
+
+    async def run(request_id: int, mac: str, method: str, kwargs: dict) -> None:
+        try:
+            if method not in METHODS:
+                raise ValueError(f"unknown method {method}")
+            reply = ('result', request_id, True, await getattr(bulbs[mac], method)(**kwargs))
+        except Exception as err:
+            reply = ('result', request_id, False, (type(err).__name__, str(err)))
+        # the caller sees the state its command left behind
+        dirty.discard(mac)
+        sender.send(reply + ({mac: bulbs[mac].state} if mac in bulbs else {},))
+
+    def on_readable() -> None:
+        try:
+            while conn.poll():
+                message = conn.recv()
+                if message[0] == 'stop':
+                    if not stopped.done():
+                        stopped.set_result(None)
+                    return
+                task = loop.create_task(run(*message[1:]))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except EOFError:
+            front_end_gone()
+
+    loop.add_reader(conn.fileno(), on_readable)
+    sender.send(('ready', list(bulbs)))
+    rssi_sent = loop.time()
+    try:
+        while not stopped.done():
+            await asyncio.wait([stopped], timeout=STATE_INTERVAL)
+            if dirty:
+                batch = {mac: bulbs[mac].state for mac in dirty}
+                dirty.clear()
+                sender.send(('state', batch))
+            if heard and loop.time() - rssi_sent >= RSSI_INTERVAL:
+                sender.send(('rssi', [(mac, adapter, rssi) for (mac, adapter), rssi in heard.items()]))
+                heard.clear()
+                rssi_sent = loop.time()
+    finally:
+        loop.remove_reader(conn.fileno())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*(b.disconnect() for b in bulbs.values()),
+                             return_exceptions=True)
+        await asyncio.to_thread(sender.close, STOP_FLUSH)
+        conn.close()
+
+
+def _worker(conn, spec: dict, level: int) -> None:
+    logging.basicConfig(level=level)
+    asyncio.run(_serve(conn, spec))
+
+
+class Fleet():
+    """
+    Front end of a sharded fleet, routes commands to the worker owning
+    the bulb and aggregates state pushed back by all workers.
+
+    Workers are spawned, so a script using Fleet needs the
+    `if __name__ == "__main__":` guard.
+    """
+
+    def __init__(self, addresses: list[str], shards: int = None, registry: str = None,
+                 adapters: list[str] = None, simulate: float = None) -> None:
+        """
+        :param addresses: mac addresses
+        :param shards: worker processes, default one per CPU core
+        :param registry: registry file the workers load the bulbs from
+        :param adapters: adapters to split across the shards
+        :param simulate: use simulated bulbs with this latency instead
+        """
+        rssi = None
+        # kept by the front end only, workers push the RSSI they hear per adapter
+        self._registry = None
+        if adapters and registry:
+            from .registry import Registry
+            self._registry = Registry(registry)
+            rssi = {address.upper(): self._registry.adapter_rssi(address) for address in addresses}
+        self._plan = plan_shards(addresses, shards or os.cpu_count() or 1, adapters, rssi)
+        for spec in self._plan:
+            spec['registry'] = registry
+            spec['simulate'] = simulate
+        self._processes: list[multiprocessing.Process] = []
+        self._conns: list = []
+        self._senders: list[_Sender] = []
+        self._routes: dict[str, int] = {}
+        self._states: dict[str, dict] = {}
+        self._pending: dict[int, tuple[int, asyncio.Future]] = {}
+        self._ids = itertools.count()
+        self._ready: list[asyncio.Future] = []
+        self._state_callbacks: list[Callable[[str], None]] = []
+        self._stopping = False
+        self._lost: set[int] = set()
+
+    def add_callback_on_state_changed(self, func: Callable[[str], None]) -> None:
+        """
+        Register callbacks to be called with the mac of a bulb whose state changed
+        """
+        self._state_callbacks.append(func)
+
+    async def start(self) -> None:
+        """Start the workers and wait until all bulbs are set up"""
+        loop = asyncio.get_running_loop()
+        # spawn, a forked child would inherit the running loop
+        context = multiprocessing.get_context('spawn')
+        for shard, spec in enumerate(self._plan):
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=_worker, args=(child, spec, logging.getLogger().level),
+                name=f"fleet-{shard}", daemon=True)
+            process.start()
+            child.close()
+            self._processes.append(process)
+            self._conns.append(parent)
+            self._senders.append(_Sender(
+                parent, f"fleet-sender-{shard}", lambda shard=shard: self._worker_lost(shard)))
+            self._ready.append(loop.create_future())
+            loop.add_reader(parent.fileno(), self._on_readable, shard)
+        await asyncio.gather(*self._ready)
+        _LOGGER.info(
+            f"Fleet: {len(self._routes)} bulbs on {len(self._processes)} workers")
+
+    def _on_readable(self, shard: int) -> None:
+        conn = self._conns[shard]
+        try:
+            while conn.poll():
+                self._dispatch(shard, conn.recv())
+        except (EOFError, OSError):
+            self._worker_lost(shard)
+
+    def _dispatch(self, shard: int, message: tuple) -> None:
+        kind = message[0]
+        if kind == 'state':
+            self._update_states(message[1])
+        elif kind == 'result':
+            _, request_id, ok, value, states = message
+            self._update_states(states)
+            _, future = self._pending.pop(request_id, (None, None))
+            if future is None or future.done():
+                return
+            if ok:
+                future.set_result(value)
+            else:
+                name, text = value
+                future.set_exception(_ERRORS.get(name, RuntimeError)(text))
+        elif kind == 'rssi':
+            if self._registry is not None:
+                for mac, adapter, rssi in message[1]:
+                    self._registry.record_rssi(mac, rssi, adapter)
+                self._registry.save()
+        elif kind == 'ready':
+            for mac in message[1]:
+                self._routes[mac] = shard
+            if not self._ready[shard].done():
+                self._ready[shard].set_result(None)
+
+    def _update_states(self, states: dict[str, dict]) -> None:
+        self._states.update(states)
+        for mac in states:
+            for func in self._state_callbacks:
+                func(mac)
+
+    def _worker_lost(self, shard: int) -> None:
+        if shard in self._lost:
+            return
+        self._lost.add(shard)
+        if not self._stopping:
+            _LOGGER.error(f"Fleet: worker {shard} exited")
+        asyncio.get_running_loop().remove_reader(self._conns[shard].fileno())
+        error = RuntimeError(f"fleet worker {shard} exited")
+        if not self._ready[shard].done():
+            self._ready[shard].set_exception(error)
+        for request_id, (owner, future) in list(self._pending.items()):
+            if owner == shard:
+                del self._pending[request_id]
+                if not future.done():
+                    future.set_exception(error)
+
+    async def call(self, mac: str, method: str, **kwargs) -> Any:
+        """
+        Run a Bulb method in the worker owning the bulb
+
+        :param mac: mac address
+        :param method: Bulb method name, see METHODS
+        :param kwargs: method arguments
+        """
+        shard = self._routes[mac.upper()]
+        if shard in self._lost:
+            raise RuntimeError(f"fleet worker {shard} exited")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = (shard, future)
+        self._senders[shard].send(('call', request_id, mac.upper(), method, kwargs))
+        return await future
+
+    def state(self, mac: str) -> dict | None:
+        """
+        :return: last state pushed by the worker owning the bulb
+        """
+        return self._states.get(mac.upper())
+
+    @property
+    def states(self) -> dict[str, dict]:
+        """Get state of all bulbs."""
+        return dict(self._states)
+
+    @property
+    def routes(self) -> dict[str, int]:
+        """Get mac to shard."""
+        return dict(self._routes)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Disconnect all bulbs and stop the workers"""
+        loop = asyncio.get_running_loop()
+        self._stopping = True
+        for sender in self._senders:
+            sender.send(('stop',))
+        for shard, process in enumerate(self._processes):
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                _LOGGER.warning(f"Fleet: worker {shard} did not stop, terminating")
+                process.terminate()
+            try:
+                loop.remove_reader(self._conns[shard].fileno())
+            except (OSError, ValueError):
+                pass
+            await asyncio.to_thread(self._senders[shard].close, STOP_FLUSH)
+            self._conns[shard].close()
+        self._processes = []
+        self._conns = []
+        self._senders = []
+        self._lost = set()
+        self._stopping = False
+
+
+async def _run(args) -> None:
+    if args.simulate:
+        addresses = [f"00:00:00:00:{i // 256:02X}:{i % 256:02X}" for i in range(args.simulate)]
+    else:
+        from .registry import Registry
+        addresses = Registry(args.registry).addresses()
+    fleet = Fleet(addresses, shards=args.shards, registry=args.registry,
+                  adapters=args.adapters, simulate=args.latency if args.simulate else None)
+    await fleet.start()
+    try:
+        await asyncio.gather(*(fleet.call(mac, 'update') for mac in fleet.routes),
+                             return_exceptions=True)
+        for mac, state in sorted(fleet.states.items()):
+            print(mac, state)
+    finally:
+        await fleet.stop()
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--registry', help="device registry file")
+    parser.add_argument('--shards', type=int, default=None,
+                        help="worker processes, default one per CPU core")
+    parser.add_argument('--adapters', nargs='+', help="adapters to split across the shards")
+    parser.add_argument('--simulate', type=int, default=0,
+                        help="run this many simulated bulbs instead of the registry")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="latency of simulated bulbs")
+    parser.add_argument('--debug', action='store_true')
+    args = parser.parse_args(argv)
+    if not args.registry and not args.simulate:
+        parser.error("--registry or --simulate is required")
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+HTTP/WebSocket gateway owning every bulb connection
+
+    python -m bluetooth_speaker_bulb.gateway --registry bulbs.jsonl --port 8080
+
+REST:
+    GET  /bulbs                     state of all bulbs
+    GET  /bulbs/{mac}               state of one bulb
+    POST /bulbs/{mac}/update        read state from the bulb
+    POST /bulbs/{mac}/{setter}      call a Bulb setter, JSON body as keyword arguments
+WebSocket:
+    GET  /ws                        pushed {"mac": ..., "state": ...} on every change
+
+Requires aiohttp (pip install bluetooth_speaker_bulb[gateway]).
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+from aiohttp import WSMsgType, web
+
+from .bulb import SETTERS, Bulb
+from .registry import Registry
+
+_LOGGER = logging.getLogger(__name__)
+
+# method: arguments that select what the call changes, calls only coalesce
+# when these match
+TARGET_ARGUMENTS = {
+    'set_frequency_level': ('frequency',),
+}
+
+
+class _Request():
+    """
+    A coalesced request, runs in its own task so a caller cancelled while
+    it waits for the link does not cancel it for the others
+    """
+    __slots__ = ('kwargs', 'callers', 'task')
+
+    def __init__(self, kwargs: dict) -> None:
+        self.kwargs = kwargs
+        self.callers = 0
+        self.task: asyncio.Task | None = None
+
+
+class Gateway():
+    """
+    Owns the bulbs and multiplexes client requests onto each bulb's link.
+
+    Requests for a bulb run one at a time. A request waiting for the link
+    is coalesced with later requests for the same method and target: the
+    latest arguments win and all callers share the one result, the request
+    is only cancelled when all its callers are. The target
+    is which arguments are given, plus the values of TARGET_ARGUMENTS, so
+    turn_on(brightness=...) and turn_on(rgb_color=...) stay separate.
+    """
+
+    def __init__(self, bulbs: list[Bulb] = None) -> None:
+        self._bulbs: dict[str, Bulb] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._queued: dict[tuple, _Request] = {}
+        self._published: dict[str, dict] = {}
+        self._websockets: set[web.WebSocketResponse] = set()
+        for bulb in bulbs or []:
+            self.add_bulb(bulb)
+
+    def add_bulb(self, bulb: Bulb) -> None:
+        mac = bulb.address
+        self._bulbs[mac] = bulb
+        self._locks[mac] = asyncio.Lock()
+        bulb.add_callback_on_state_changed(lambda: self.publish(mac))
+
+    @property
+    def bulbs(self) -> dict[str, Bulb]:
+        """Get bulbs."""
+        return self._bulbs
+
+    async def call(self, mac: str, method: str, **kwargs):
+        """
+        Run a Bulb method on the bulb's link, coalescing queued requests
+
+        :param mac: mac address
+        :param method: Bulb method name
+        :param kwargs: method arguments
+        """
+        bulb = self._bulbs[mac]
+        key = (mac, method, self._target(method, kwargs))
+        request = self._queued.get(key)
+        if request is not None:
+            request.kwargs = kwargs
+        else:
+            request = self._queued[key] = _Request(kwargs)
+            request.task = asyncio.create_task(self._run(bulb, key, request))
+        request.callers += 1
+        try:
+            return await asyncio.shield(request.task)
+        except asyncio.CancelledError:
+            request.callers -= 1
+            if not request.callers:
+                request.task.cancel()
+            raise
+
+    async def _run(self, bulb: Bulb, key: tuple, request: _Request):
+        mac, method, _ = key
+        try:
+            async with self._locks[mac]:
+                # running now, later callers start a new request
+                if self._queued.get(key) is request:
+                    del self._queued[key]
+                result = await getattr(bulb, method)(**request.kwargs)
+        finally:
+            if self._queued.get(key) is request:
+                del self._queued[key]
+        self.publish(mac)
+        return result
+
+    @staticmethod
+    def _target(method: str, kwargs: dict) -> tuple:
+        given = tuple(sorted(k for k, v in kwargs.items() if v is not None))
+        selectors = tuple(repr(kwargs.get(k)) for k in TARGET_ARGUMENTS.get(method, ()))
+        return given, selectors
+
+    def publish(self, mac: str) -> None:
+        """Push the bulb state to websocket clients if it changed"""
+        state = self._bulbs[mac].state
+        if self._published.get(mac) == state:
+            return
+        self._published[mac] = state
+        message = json.dumps({'mac': mac, 'state': state})
+        for ws in list(self._websockets):
+            if ws.closed:
+                self._websockets.discard(ws)
+                continue
+            asyncio.ensure_future(ws.send_str(message))
+
+    def _bulb_or_404(self, request: web.Request) -> str:
+        mac = request.match_info['mac'].upper()
+        if mac not in self._bulbs:
+            raise web.HTTPNotFound(text=f"unknown bulb {mac}")
+        return mac
+
+    async def handle_list(self, request: web.Request) -> web.Response:
+        return web.json_response({mac: b.state for mac, b in self._bulbs.items()})
+
+    async def handle_state(self, request: web.Request) -> web.Response:
+        mac = self._bulb_or_404(request)
+        return web.json_response(self._bulbs[mac].state)
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        mac = self._bulb_or_404(request)
+        await self.call(mac, 'update')
+        return web.json_response(self._bulbs[mac].state)
+
+    async def handle_setter(self, request: web.Request) -> web.Response:
+        mac = self._bulb_or_404(request)
+        method = request.match_info['method']
+        if method not in SETTERS:
+            raise web.HTTPNotFound(text=f"unknown method {method}")
+        kwargs = await request.json() if request.can_read_body else {}
+        if not isinstance(kwargs, dict):
+            raise web.HTTPBadRequest(text="body must be a JSON object")
+        try:
+            result = await self.call(mac, method, **kwargs)
+        except (TypeError, KeyError, ValueError) as err:
+            raise web.HTTPBadRequest(text=f"{type(err).__name__}: {err}")
+        return web.json_response({'ok': result is not False,
+                                  'state': self._bulbs[mac].state})
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        for mac, bulb in self._bulbs.items():
+            await ws.send_str(json.dumps({'mac': mac, 'state': bulb.state}))
+        self._websockets.add(ws)
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.ERROR:
+                    break
+        finally:
+            self._websockets.discard(ws)
+        return ws
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.get('/bulbs', self.handle_list),
+            web.get('/bulbs/{mac}', self.handle_state),
+            web.post('/bulbs/{mac}/update', self.handle_update),
+            web.post('/bulbs/{mac}/{method}', self.handle_setter),
+            web.get('/ws', self.handle_ws),
+        ])
+        app.on_shutdown.append(self._on_shutdown)
+        return app
+
+    async def _on_shutdown(self, app: web.Application) -> None:
+        for ws in list(self._websockets):
+            await ws.close()
+        await asyncio.gather(*(b.disconnect() for b in self._bulbs.values()),
+                             return_exceptions=True)
+
+
+async def _create_gateway(args) -> web.Application:
+    bulbs = []
+    if args.simulate:
+        from .simulator import create_simulated_bulb
+        for i in range(args.simulate):
+            bulbs.append(await create_simulated_bulb(f"00:00:00:00:{i // 256:02X}:{i % 256:02X}"))
+    if args.registry:
+        registry = Registry(args.registry)
+        for address in registry.addresses():
+            bulbs.append(Bulb.from_registry(registry, address))
+    for bulb in bulbs:
+        bulb.start_keepalive()
+    return Gateway(bulbs).create_app()
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--registry', help="device registry file")
+    parser.add_argument('--simulate', type=int, default=0,
+                        help="add simulated bulbs instead of real ones")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(_create_gateway(args), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import csv
+import json
+import os
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import mul, sub
+
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+# field: array typecode
+HISTORY_FIELDS = {
+    'on':           'B',
+    'brightness':   'B',
+    'r':            'B',
+    'g':            'B',
+    'b':            'B',
+    'cold':         'B',
+    'warm':         'B',
+    'effect_id':    'B',
+    'volume':       'B',
+}
+
+
+class StateHistory():
+    """
+    Fixed size ring buffer of timestamped state transitions for one bulb,
+    stored column wise in preallocated arrays.
+
+    A transition is recorded only when a field changes, the fields not
+    given to record() keep their previous value.
+    """
+    __slots__ = ('_capacity', '_timestamps', '_columns', '_head', '_count', '_last')
+
+    def __init__(self, capacity: int = 4096) -> None:
+        self._capacity = capacity
+        self._timestamps = array('d', bytes(8 * capacity))
+        self._columns = {
+            field: array(typecode, bytes(array(typecode).itemsize * capacity))
+            for field, typecode in HISTORY_FIELDS.items()
+        }
+        self._head = 0
+        self._count = 0
+        self._last = dict.fromkeys(HISTORY_FIELDS, 0)
+
+    def record(self, timestamp: float = None, **fields) -> bool:
+        """
+        Record a transition
+
+        :param timestamp: defaults to time.time()
+        :param fields: changed fields, None values are ignored
+        :return: True if anything changed
+        """
+        changed = False
+        for field, value in fields.items():
+            if value is None:
+                continue
+            value = int(value)
+            if self._last[field] != value:
+                self._last[field] = value
+                changed = True
+        if not changed and self._count:
+            return False
+        head = self._head
+        self._timestamps[head] = time.time() if timestamp is None else timestamp
+        for field, column in self._columns.items():
+            column[head] = self._last[field]
+        self._head = (head + 1) % self._capacity
+        self._count = min(self._count + 1, self._capacity)
+        return True
+
+    def record_light(self, light, timestamp: float = None) -> bool:
+        r, g, b = light._rgb or (None, None, None)
+        return self.record(
+            timestamp,
+            on=light._on, brightness=light._brightness, r=r, g=g, b=b,
+            cold=light._cold, warm=light._warm, effect_id=light._effect_id,
+        )
+
+    def record_speaker(self, speaker, timestamp: float = None) -> bool:
+        return self.record(timestamp, volume=speaker._volume)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _ordered(self, column: array) -> array:
+        if self._count < self._capacity:
+            return column[:self._count]
+        return column[self._head:] + column[:self._head]
+
+    def columns(self) -> dict[str, array]:
+        """
+        :return: field to array in time order, 'timestamp' included
+        """
+        columns = {'timestamp': self._ordered(self._timestamps)}
+        for field, column in self._columns.items():
+            columns[field] = self._ordered(column)
+        return columns
+
+    def _segments(self, field: str, start: float, end: float) -> tuple[list, array]:
+        """
+        :return: segment boundaries and the value held in each segment
+        """
+        timestamps = self._ordered(self._timestamps)
+        values = self._ordered(self._columns[field])
+        first = max(bisect_right(timestamps, start) - 1, 0)
+        last = bisect_left(timestamps, end)
+        if last <= first:
+            return [], values[:0]
+        bounds = timestamps[first:last].tolist()
+        bounds[0] = max(bounds[0], start)
+        bounds.append(end)
+        return bounds, values[first:last]
+
+    def integral(self, field: str, start: float, end: float) -> float:
+        """
+        Time weighted sum of a field over [start, end)
+        """
+        bounds, values = self._segments(field, start, end)
+        return sum(map(mul, map(sub, bounds[1:], bounds[:-1]), values))
+
+    def uptime(self, start: float, end: float) -> float:
+        """
+        :return: seconds the light was on in [start, end)
+        """
+        return self.integral('on', start, end)
+
+    def average(self, field: str, start: float, end: float) -> float:
+        """
+        :return: time weighted average of a field over the recorded part of [start, end)
+        """
+        bounds, _ = self._segments(field, start, end)
+        if not bounds or bounds[-1] <= bounds[0]:
+            return 0.0
+        return self.integral(field, start, end) / (bounds[-1] - bounds[0])
+
+    def average_brightness(self, start: float, end: float) -> float:
+        return self.average('brightness', start, end)
+
+    def changes(self, start: float, end: float) -> int:
+        """
+        :return: number of transitions in [start, end)
+        """
+        timestamps = self._ordered(self._timestamps)
+        return bisect_left(timestamps, end) - bisect_left(timestamps, start)
+
+    def to_csv(self, path: str) -> None:
+        columns = self.columns()
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(zip(*columns.values()))
+
+    def to_columns(self, directory: str) -> None:
+        """
+        Columnar export, one raw little endian file per field plus schema.json
+        """
+        os.makedirs(directory, exist_ok=True)
+        columns = self.columns()
+        schema = {'rows': self._count, 'columns': {}}
+        for field, column in columns.items():
+            if column.itemsize > 1 and not _LITTLE_ENDIAN:
+                column.byteswap()
+            with open(os.path.join(directory, f"{field}.bin"), 'wb') as f:
+                column.tofile(f)
+            schema['columns'][field] = column.typecode
+        with open(os.path.join(directory, 'schema.json'), 'w', encoding='utf-8') as f:
+            json.dump(schema, f)
+
+
+def read_columns(directory: str) -> dict[str, array]:
+    """
+    Read a to_columns export back
+    """
+    with open(os.path.join(directory, 'schema.json'), encoding='utf-8') as f:
+        schema = json.load(f)
+    columns = {}
+    for field, typecode in schema['columns'].items():
+        column = array(typecode)
+        with open(os.path.join(directory, f"{field}.bin"), 'rb') as f:
+            column.fromfile(f, schema['rows'])
+        if column.itemsize > 1 and not _LITTLE_ENDIAN:
+            column.byteswap()
+        columns[field] = column
+    return columns
+
@@ -0,0 +1,130 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections import deque
+from enum import Enum
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Lane(Enum):
+    """
+    An enum of command lanes, in priority order
+    """
+    INTERACTIVE = 0
+    BACKGROUND = 1
+    BULK = 2
+
+
+class LaneScheduler():
+    """
+    Per link command scheduler with priority lanes.
+
+    One operation holds the link at a time. When the link frees up, the
+    highest priority lane with waiting commands goes next, except that a
+    lane passed over `max_skips` times in a row goes first, so background
+    and bulk traffic keep moving under a flood of interactive commands.
+    Operations nested in the one holding the link run straight away.
+    """
+
+    def __init__(self, name: str, max_skips: int = 4) -> None:
+        self._name = name
+        self._max_skips = max_skips
+        self._waiters: dict[Lane, deque[asyncio.Future]] = {lane: deque() for lane in Lane}
+        self._skipped = dict.fromkeys(Lane, 0)
+        self._busy = False
+        self._holder: asyncio.Task | None = None
+        self._served = dict.fromkeys(Lane, 0)
+        self._wait_total = dict.fromkeys(Lane, 0.0)
+        self._wait_max = dict.fromkeys(Lane, 0.0)
+
+    def _next_lane(self) -> Lane | None:
+        waiting = [lane for lane in Lane if self._waiters[lane]]
+        if not waiting:
+            return None
+        starved = [lane for lane in waiting if self._skipped[lane] >= self._max_skips]
+        chosen = starved[0] if starved else waiting[0]
+        for lane in waiting:
+            self._skipped[lane] = 0 if lane == chosen else self._skipped[lane] + 1
+        return chosen
+
+    def _served_after(self, lane: Lane, waited: float) -> None:
+        self._served[lane] += 1
+        self._wait_total[lane] += waited
+        self._wait_max[lane] = max(self._wait_max[lane], waited)
+
+    async def acquire(self, lane: Lane) -> None:
+        """
+        Wait for the link
+
+        :param lane: lane of the command
+        """
+        if not self._busy and not any(self._waiters.values()):
+            self._busy = True
+            self._served_after(lane, 0.0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        queued = time.monotonic()
+        self._waiters[lane].append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future in self._waiters[lane]:
+                self._waiters[lane].remove(future)
+            elif not future.cancelled():
+                # granted while being cancelled, hand the link on
+                self.release()
+            raise
+        self._served_after(lane, time.monotonic() - queued)
+
+    def release(self) -> None:
+        """Hand the link to the next waiting command"""
+        self._holder = None
+        while True:
+            lane = self._next_lane()
+            if lane is None:
+                self._busy = False
+                return
+            future = self._waiters[lane].popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+
+    @contextlib.asynccontextmanager
+    async def slot(self, lane: Lane):
+        """
+        Hold the link for one operation
+
+        :param lane: lane of the operation
+        """
+        task = asyncio.current_task()
+        if self._holder is not None and self._holder is task:
+            yield
+            return
+        await self.acquire(lane)
+        self._holder = task
+        try:
+            yield
+        finally:
+            self.release()
+
+    def depth(self, lane: Lane) -> int:
+        """
+        :return: commands waiting in a lane
+        """
+        return sum(1 for f in self._waiters[lane] if not f.done())
+
+    def metrics(self) -> dict[str, dict[str, float]]:
+        """
+        :return: lane name to queue depth, served commands, average and max wait in seconds
+        """
+        return {
+            lane.name.lower(): {
+                'depth': self.depth(lane),
+                'served': self._served[lane],
+                'wait_avg': self._wait_total[lane] / self._served[lane] if self._served[lane] else 0.0,
+                'wait_max': self._wait_max[lane],
+            }
+            for lane in Lane
+        }
@@ -1,7 +1,9 @@
 import logging
+import time
 
 from .const import *
 from .protocol import *
+from .snapshot import LightSnapshot
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -12,14 +14,20 @@ class Light():
     """
     Class for speaker part of bulb
     """
+    __slots__ = ('_on', '_brightness', '_cold', '_warm', '_white_intensity',
+                 '_rgb', '_white', '_effect_id', '_effect', '_history')
 
-    def __init__(self) -> None:
+    def __init__(self, history=None) -> None:
+        """
+        :param history: StateHistory recording every update, optional
+        """
+        self._history = history
         self._on: bool = None
         self._brightness: int = None
         self._cold: int = None
         self._warm: int = None
         self._white_intensity: int = None
-        self._rgb: list = None
+        self._rgb: tuple = None
         self._white: bool = True
         self._effect_id: int = None
         self._effect: str = None
@@ -34,11 +42,11 @@ class Light():
         self._cold = raw_data[DATA_LIGHT]['cold']
         self._warm = raw_data[DATA_LIGHT]['warm']
         self._white_intensity = self._cold
-        self._rgb = [
+        self._rgb = (
             raw_data[DATA_LIGHT]['r'],
             raw_data[DATA_LIGHT]['g'],
             raw_data[DATA_LIGHT]['b']
-        ]
+        )
         self._white = True if self._warm > 0 or self._cold > 0 else False
         self._effect_id = raw_data[DATA_LIGHT]['effect_raw']
         if (self._effect_id > 0):
@@ -49,6 +57,8 @@ class Light():
                 pass
         else:
             self._effect = None
+        if self._history is not None:
+            self._history.record_light(self)
 
     def turn_off(self) -> str:
         """
@@ -94,6 +104,9 @@ class Light():
 
         :param rgb_color: color as a list of 3 values between 0 and 255
         """
+        rgb = tuple(int(c) for c in rgb)
+        if len(rgb) != 3 or not all(0 <= c <= 255 for c in rgb):
+            raise ValueError(f"rgb must be 3 values between 0 and 255, got {rgb}")
         self._rgb = rgb
         self._white = False
         return encode_msg(
@@ -146,6 +159,24 @@ class Light():
             e
         )
 
+    def snapshot(self, timestamp: float = None) -> LightSnapshot:
+        """
+        Immutable compact copy of the state (see :class:`.LightSnapshot`),
+        unknown values are stored as 0
+
+        :param timestamp: defaults to time.time()
+        """
+        r, g, b = self._rgb or (0, 0, 0)
+        return LightSnapshot(
+            time.time() if timestamp is None else timestamp,
+            r, g, b,
+            self._cold or 0,
+            self._warm or 0,
+            self._brightness or 0,
+            1 if self._on else 0,
+            self._effect_id or 0,
+        )
+
     @property
     def on(self) -> bool:
         """Get on."""
@@ -159,7 +190,7 @@ class Light():
     @property
     def rgb_color(self) -> list:
         """Get color."""
-        return self._rgb
+        return list(self._rgb) if self._rgb is not None else None
 
     @property
     def white(self) -> bool:
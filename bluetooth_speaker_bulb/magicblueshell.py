@@ -0,0 +1,255 @@
+"""
+Command line for bluetooth speaker bulbs
+
+    bluetooth_speaker_bulb discover
+    bluetooth_speaker_bulb batch commands.txt
+    bluetooth_speaker_bulb shell
+
+A command is `<mac>[,<mac>...] <command> [args...]` or a JSON line
+{"mac": "..." or ["...", ...], "cmd": "...", "args": [...]}.
+Results are written as JSON lines with the latency of every command.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+
+from .registry import Registry
+
+# bleak and the BLE modules are imported when a command runs, so --help
+# and argument errors stay fast
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _int(value) -> int:
+    return int(value, 0) if isinstance(value, str) else int(value)
+
+
+def _rgb(*values) -> list:
+    if len(values) == 1 and isinstance(values[0], str):
+        values = values[0].split(',')
+    if len(values) == 1:
+        values = values[0]
+    return [_int(v) for v in values]
+
+
+async def _state(bulb: "Bulb") -> dict:
+    return bulb.state
+
+
+# command: (coroutine taking bulb and args, help)
+COMMANDS = {
+    'connect':          (lambda b: b.connect(), ""),
+    'disconnect':       (lambda b: b.disconnect(), ""),
+    'name':             (lambda b: b.get_device_name(), ""),
+    'update':           (lambda b: b.update(), ""),
+    'state':            (_state, ""),
+    'on':               (lambda b: b.turn_on(), ""),
+    'off':              (lambda b: b.turn_off(), ""),
+    'brightness':       (lambda b, v: b.set_brightness(_int(v)), "<0..255>"),
+    'rgb':              (lambda b, *v: b.set_color_rgb(_rgb(*v)), "<r,g,b>"),
+    'white':            (lambda b: b.set_white(), ""),
+    'white_intensity':  (lambda b, v: b.set_white_intensity(_int(v)), "<1..255>"),
+    'effect':           (lambda b, e: b.set_effect(e), "<effect>"),
+    'volume':           (lambda b, v: b.set_volume(_int(v)), "<0..100>"),
+    'speaker_effect':   (lambda b, e: b.set_speaker_effect(e), "<effect>"),
+}
+
+
+def parse_command(line: str) -> tuple[list[str], str, list] | None:
+    """
+    :param line: text or JSON line
+    :return: (macs, command, args) or None for blank lines and comments
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line.startswith('{'):
+        data = json.loads(line)
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+        macs = data['mac']
+        macs = [macs] if isinstance(macs, str) else macs
+        if not isinstance(macs, list) or not all(isinstance(m, str) for m in macs):
+            raise ValueError(f"mac must be a string or a list of strings, got {data['mac']!r}")
+        if not isinstance(data['cmd'], str):
+            raise ValueError(f"cmd must be a string, got {data['cmd']!r}")
+        args = data.get('args', [])
+        if not isinstance(args, list):
+            raise ValueError(f"args must be a list, got {args!r}")
+        return macs, data['cmd'], args
+    parts = line.split()
+    if len(parts) < 2:
+        raise ValueError(f"expected '<mac> <command> [args]', got {line!r}")
+    return parts[0].split(','), parts[1], parts[2:]
+
+
+class Shell():
+    """
+    Runs commands against many bulbs on one event loop, concurrently across
+    bulbs and in order for each bulb
+    """
+
+    def __init__(self, concurrency: int = 8, timeout: int = 20, registry: Registry = None,
+                 output=sys.stdout) -> None:
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._timeout = timeout
+        self._registry = registry
+        self._output = output
+        self._bulbs: dict[str, "Bulb"] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def emit(self, result: dict) -> None:
+        self._output.write(json.dumps(result, default=str) + '\n')
+        self._output.flush()
+
+    async def get_bulb(self, mac: str) -> "Bulb | None":
+        from .bulb import Bulb
+        from .connection import find_device_by_address
+
+        mac = mac.upper()
+        bulb = self._bulbs.get(mac)
+        if bulb is not None:
+            return bulb
+        if self._registry is not None:
+            bulb = Bulb.from_registry(self._registry, mac, refresh=False,
+                                      timeout=self._timeout)
+        if bulb is None:
+            device = await find_device_by_address(mac, timeout=self._timeout)
+            if device is None:
+                return None
+            bulb = Bulb(device, timeout=self._timeout)
+        self._bulbs[mac] = bulb
+        return bulb
+
+    async def run_one(self, mac: str, command: str, args: list) -> dict:
+        result = {'mac': mac.upper(), 'cmd': command}
+        start = time.monotonic()
+        lock = self._locks.setdefault(mac.upper(), asyncio.Lock())
+        try:
+            if command not in COMMANDS:
+                raise ValueError(f"unknown command {command}")
+            async with lock, self._semaphore:
+                bulb = await self.get_bulb(mac)
+                if bulb is None:
+                    raise LookupError(f"{mac} not found")
+                result['result'] = await COMMANDS[command][0](bulb, *args)
+            result['ok'] = result['result'] is not False
+        except Exception as err:
+            result['ok'] = False
+            result['error'] = f"{type(err).__name__}: {err}"
+        result['latency_ms'] = round((time.monotonic() - start) * 1000, 1)
+        self.emit(result)
+        return result
+
+    def submit(self, line: str) -> list[asyncio.Task]:
+        try:
+            parsed = parse_command(line)
+        except (ValueError, KeyError, TypeError) as err:
+            self.emit({'ok': False, 'error': f"{type(err).__name__}: {err}",
+                       'line': line.strip()})
+            return []
+        if parsed is None:
+            return []
+        macs, command, args = parsed
+        return [asyncio.create_task(self.run_one(mac, command, args)) for mac in macs]
+
+    async def batch(self, lines) -> bool:
+        tasks = []
+        for line in lines:
+            tasks += self.submit(line)
+        results = await asyncio.gather(*tasks)
+        return all(r['ok'] for r in results)
+
+    async def batch_stream(self, stream) -> bool:
+        """Start commands as lines arrive on stream, e.g. stdin"""
+        loop = asyncio.get_running_loop()
+        tasks = []
+        while True:
+            line = await loop.run_in_executor(None, stream.readline)
+            if not line:
+                break
+            tasks += self.submit(line)
+        results = await asyncio.gather(*tasks)
+        return all(r['ok'] for r in results)
+
+    async def interactive(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                line = await loop.run_in_executor(None, input, "bulb> ")
+            except EOFError:
+                break
+            if line.strip() in ('quit', 'exit'):
+                break
+            if line.strip() == 'help':
+                for name, (_, usage) in COMMANDS.items():
+                    print(f"<mac>[,<mac>...] {name} {usage}")
+                continue
+            await asyncio.gather(*self.submit(line))
+
+    async def close(self) -> None:
+        from .scanner import stop_shared_scanner
+
+        await asyncio.gather(*(b.disconnect() for b in self._bulbs.values()),
+                             return_exceptions=True)
+        await stop_shared_scanner()
+        if self._registry is not None:
+            for bulb in self._bulbs.values():
+                bulb.save_to(self._registry)
+            self._registry.save()
+
+
+async def discover(output=sys.stdout) -> None:
+    from .connection import discover_bluetooth_speaker_bulb_lamps
+
+    for lamp in await discover_bluetooth_speaker_bulb_lamps(None):
+        output.write(json.dumps(
+            {'mac': lamp['ble_device'].address, 'name': lamp['ble_device'].name,
+             'model': lamp['model']}) + '\n')
+
+
+async def run(args) -> int:
+    if args.mode == 'discover':
+        await discover()
+        return 0
+    registry = Registry(args.registry) if args.registry else None
+    shell = Shell(concurrency=args.concurrency, timeout=args.timeout, registry=registry)
+    try:
+        if args.mode == 'batch':
+            if args.script == '-':
+                ok = await shell.batch_stream(sys.stdin)
+            else:
+                with open(args.script, encoding='utf-8') as f:
+                    ok = await shell.batch(f.readlines())
+            return 0 if ok else 1
+        await shell.interactive()
+        return 0
+    finally:
+        await shell.close()
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='bluetooth_speaker_bulb', description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('mode', choices=['discover', 'batch', 'shell'])
+    parser.add_argument('script', nargs='?', default='-',
+                        help="batch script or JSON lines, - for stdin")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="bulbs driven at the same time")
+    parser.add_argument('--timeout', type=int, default=20,
+                        help="per operation timeout in seconds")
+    parser.add_argument('--registry', help="device registry file")
+    parser.add_argument('--debug', action='store_true')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING,
+                        stream=sys.stderr)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
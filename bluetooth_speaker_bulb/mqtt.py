@@ -0,0 +1,163 @@
+"""
+MQTT bridge
+
+Command topics, JSON payload with keyword arguments:
+    {prefix}/{mac}/set/{setter}     e.g. set/set_brightness {"brightness": 100}
+    {prefix}/{mac}/update           read state from the bulb
+State topics, retained, published only when the field changes:
+    {prefix}/{mac}/state/{field}
+
+The client only needs `publish(topic, payload, retain=...)`, `subscribe(topic)`
+and an async iterable `messages` of objects with `topic` and `payload`,
+which matches aiomqtt.Client.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from .bulb import SETTERS, Bulb
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MqttBridge():
+    """
+    Maps command topics to Bulb methods and publishes changed state fields
+    in rate limited batches across the fleet
+    """
+
+    def __init__(self, client, bulbs: list[Bulb], prefix: str = "bluetooth_speaker_bulb",
+                 interval: float = 1.0, max_rate: float = 50.0) -> None:
+        """
+        :param client: MQTT client
+        :param bulbs: bulbs to bridge
+        :param prefix: topic prefix
+        :param interval: seconds between publish batches
+        :param max_rate: publishes per second across the fleet
+        """
+        self._client = client
+        self._prefix = prefix
+        self._interval = interval
+        self._max_rate = max_rate
+        self._tokens = max_rate
+        self._refilled = time.monotonic()
+        self._bulbs: dict[str, Bulb] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._published: dict[tuple[str, str], str] = {}
+        self._dirty: set[str] = set()
+        for bulb in bulbs:
+            self.add_bulb(bulb)
+
+    def add_bulb(self, bulb: Bulb) -> None:
+        mac = bulb.address
+        self._bulbs[mac] = bulb
+        self._locks[mac] = asyncio.Lock()
+        self._dirty.add(mac)
+        bulb.add_callback_on_state_changed(lambda: self.mark_dirty(mac))
+
+    def mark_dirty(self, mac: str) -> None:
+        self._dirty.add(mac)
+
+    async def handle_message(self, topic: str, payload: bytes) -> bool:
+        """
+        Run the command of a message
+
+        :return: True if the command succeeded
+        """
+        parts = topic[len(self._prefix) + 1:].split('/') \
+            if topic.startswith(f"{self._prefix}/") else []
+        if len(parts) < 2 or parts[0].upper() not in self._bulbs:
+            _LOGGER.debug(f"MQTT: ignoring {topic}")
+            return False
+        mac = parts[0].upper()
+        if parts[1:] == ['update']:
+            method, kwargs = 'update', {}
+        elif len(parts) == 3 and parts[1] == 'set' and parts[2] in SETTERS:
+            method = parts[2]
+            try:
+                kwargs = json.loads(payload) if payload else {}
+            except ValueError:
+                _LOGGER.warning(f"MQTT: bad payload on {topic}: {payload!r}")
+                return False
+            if not isinstance(kwargs, dict):
+                _LOGGER.warning(f"MQTT: payload on {topic} must be a JSON object")
+                return False
+        else:
+            _LOGGER.debug(f"MQTT: unknown command {topic}")
+            return False
+        try:
+            async with self._locks[mac]:
+                result = await getattr(self._bulbs[mac], method)(**kwargs)
+        except (TypeError, KeyError, ValueError) as err:
+            _LOGGER.warning(f"MQTT: {topic} failed: {err}")
+            return False
+        self.mark_dirty(mac)
+        return result is not False
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self._max_rate,
+                           self._tokens + (now - self._refilled) * self._max_rate)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    async def flush(self) -> int:
+        """
+        Publish changed fields of dirty bulbs within the rate limit, bulbs
+        not fully published stay dirty for the next batch, also when a
+        publish raises
+
+        :return: number of messages published
+        """
+        published = 0
+        dirty, self._dirty = list(self._dirty), set()
+        for i, mac in enumerate(dirty):
+            for field, value in self._bulbs[mac].state.items():
+                payload = json.dumps(value)
+                if self._published.get((mac, field)) == payload:
+                    continue
+                if not self._take_token():
+                    self._dirty.add(mac)
+                    break
+                try:
+                    await self._client.publish(
+                        f"{self._prefix}/{mac}/state/{field}", payload, retain=True)
+                except BaseException:
+                    self._dirty.update(dirty[i:])
+                    raise
+                self._published[(mac, field)] = payload
+                published += 1
+        if published:
+            _LOGGER.debug(f"MQTT: published {published} state changes")
+        return published
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.flush()
+            except Exception as err:
+                _LOGGER.error(f"MQTT: publishing state failed: {err}")
+
+    async def run(self) -> None:
+        """
+        Subscribe to the command topics and serve until cancelled
+        """
+        await self._client.subscribe(f"{self._prefix}/+/set/+")
+        await self._client.subscribe(f"{self._prefix}/+/update")
+        flusher = asyncio.create_task(self._flush_loop())
+        commands = set()
+        try:
+            async for message in self._client.messages:
+                task = asyncio.create_task(
+                    self.handle_message(str(message.topic), message.payload))
+                commands.add(task)
+                task.add_done_callback(commands.discard)
+        finally:
+            flusher.cancel()
+            for task in commands:
+                task.cancel()
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+# Spacing between writes in seconds
+PACING_INITIAL: float = 0.5
+PACING_MIN: float = 0.02
+PACING_MAX: float = 2.0
+# Spacing factor per acknowledged write
+PACING_DECREASE: float = 0.9
+# Spacing kept above the measured processing time by this factor
+PACING_MARGIN: float = 1.25
+# Weight of a new sample in the processing time average
+LATENCY_SMOOTHING: float = 0.2
+
+
+class Pacer():
+    """
+    Per device write pacing.
+
+    Measures how soon the bulb answers a write with a notification and
+    keeps the spacing between writes above that processing time. The
+    spacing shrinks by a tenth on every acknowledged write, down to the
+    processing time, and doubles when a write is dropped.
+    """
+
+    def __init__(self, name: str, spacing: float = PACING_INITIAL,
+                 minimum: float = PACING_MIN, maximum: float = PACING_MAX) -> None:
+        self._name = name
+        self._minimum = minimum
+        self._maximum = maximum
+        self._spacing = min(max(spacing, minimum), maximum)
+        self._latency: float | None = None
+        self._last_write: float = 0.0
+        self._expect: int | None = None
+        self._expect_request = False
+        self._acks_writes = False
+        self._acked = asyncio.Event()
+        self._drops = 0
+
+    def wrote(self, category: int, request: bool) -> None:
+        """
+        Note a write, its answer is a notification of the get category
+
+        :param category: set category of the written frame
+        :param request: the frame requests data, the bulb always answers it
+        """
+        self._last_write = time.monotonic()
+        self._expect = category | 0x80
+        self._expect_request = request
+        self._acked.clear()
+
+    def notified(self, category: int) -> None:
+        """
+        Note a notification, measures the processing time if it answers
+        the last write
+
+        :param category: category of the notification
+        """
+        if self._expect is None or category != self._expect:
+            return
+        latency = time.monotonic() - self._last_write
+        self._latency = latency if self._latency is None else \
+            self._latency + LATENCY_SMOOTHING * (latency - self._latency)
+        if not self._expect_request and not self._acks_writes:
+            _LOGGER.debug(f"Pacer {self._name}: bulb acknowledges writes")
+            self._acks_writes = True
+        self._expect = None
+        self._acked.set()
+        self._spacing = max(self.floor, self._spacing * PACING_DECREASE)
+
+    def record_drop(self) -> None:
+        self._drops += 1
+        spacing = min(self._maximum, self._spacing * 2)
+        if spacing != self._spacing:
+            _LOGGER.debug(f"Pacer {self._name}: write dropped, spacing {spacing:.3f}s")
+        self._spacing = spacing
+
+    async def wait(self, ack: bool = True) -> None:
+        """
+        Wait until the bulb is ready for the next write
+
+        :param ack: also wait for the answer to the last write, if the bulb
+            gives one, a missing answer counts as a drop
+        """
+        delay = self._last_write + self._spacing - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if not ack or self._expect is None \
+                or not (self._expect_request or self._acks_writes):
+            return
+        try:
+            await asyncio.wait_for(self._acked.wait(), self.ack_timeout)
+        except asyncio.TimeoutError:
+            self._expect = None
+            self.record_drop()
+
+    @property
+    def floor(self) -> float:
+        """Get lowest spacing the measured processing time allows."""
+        if self._latency is None:
+            return self._minimum
+        return min(self._maximum, max(self._minimum, self._latency * PACING_MARGIN))
+
+    @property
+    def ack_timeout(self) -> float:
+        """Get time to wait for an answer past the spacing."""
+        return min(self._maximum, self._spacing + 2 * (self._latency or self._spacing))
+
+    @property
+    def spacing(self) -> float:
+        """Get spacing between writes."""
+        return self._spacing
+
+    @property
+    def latency(self) -> float | None:
+        """Get average processing time, None until measured."""
+        return self._latency
+
+    @property
+    def drops(self) -> int:
+        """Get number of dropped writes."""
+        return self._drops
+
+    def to_dict(self) -> dict:
+        """Learned values, to persist across restarts"""
+        return {
+            'spacing': round(self._spacing, 4),
+            'latency': None if self._latency is None else round(self._latency, 4),
+            'acks_writes': self._acks_writes,
+        }
+
+    def load(self, learned: dict) -> None:
+        """
+        Restore values from to_dict
+
+        :param learned: dict from to_dict, missing keys are ignored
+        """
+        if not learned:
+            return
+        if learned.get('spacing') is not None:
+            self._spacing = min(max(learned['spacing'], self._minimum), self._maximum)
+        if learned.get('latency') is not None:
+            self._latency = learned['latency']
+        self._acks_writes = bool(learned.get('acks_writes', self._acks_writes))
@@ -1,5 +1,9 @@
 from .const import *
 
+HEADER = (0x55, 0xaa)
+# header, data length, category, function and checksum
+FRAME_OVERHEAD = 6
+
 
 def encode_msg(category, function, data=[]):
     """
@@ -14,8 +18,7 @@ def encode_msg(category, function, data=[]):
         # Only one int as data, put in list, length will be 1
         data = [data]
     msg = bytearray([0x55, 0xaa, len(data), category, function])
-    for d in data:
-        msg.append(d)
+    msg.extend(data)
     msg.append(encode_checksum(msg))
 
     return msg
@@ -31,47 +34,40 @@ def encode_checksum(msg):
     :return: checksum
     """
     checksum_multiple = 256  # 0x100
-    hex_sum = sum(i for i in msg) + 1
+    hex_sum = sum(msg) + 1
     return ((checksum_multiple * len(msg)) - hex_sum) % checksum_multiple
 
 # Decode
 
 
+def verify_frame(buffer):
+    """
+    Check header, data length and checksum of a received frame
+
+    :param buffer: received frame
+    :return: True if the frame is well formed
+    """
+    if len(buffer) < FRAME_OVERHEAD \
+            or buffer[0] != HEADER[0] or buffer[1] != HEADER[1]:
+        return False
+    end = FRAME_OVERHEAD - 1 + buffer[2]
+    if len(buffer) <= end:
+        return False
+    return encode_checksum(buffer[:end]) == buffer[end]
+
+
 def decode_function(buffer):
     """
     Retrieve
 
-    :param buffer: buffer to decode not pretty
+    :param buffer: buffer to decode, malformed frames decode to []
     """
-    if buffer is None:
+    if not buffer or not verify_frame(buffer):
         return []
-    if len(buffer) < 1:
+    decoder = _DECODERS.get((buffer[3], buffer[4]))
+    if decoder is None or len(buffer) < decoder[0]:
         return []
-    c = buffer[3]
-    f = buffer[4]
-
-    if c == GetBulbCategory.light.value:
-        if f == GetLightFunction.status.value:
-            return decode_light_info(buffer)
-
-    if c == GetBulbCategory.timer.value:
-        if f == GetTimerFunction.auto_light.value \
-                or f == GetTimerFunction.auto_music.value:
-            return decode_time_auto(buffer)
-
-        if f == GetTimerFunction.alarm_1.value \
-                or f == GetTimerFunction.alarm_2.value \
-                or f == GetTimerFunction.alarm_3.value:
-            return decode_time_alarm(buffer)
-
-    if c == GetBulbCategory.speaker.value:
-        if f == GetSpeakerFunction.volume.value:
-            return decode_speaker_volume(buffer)
-
-        if f == GetSpeakerFunction.equalizer.value:
-            return decode_speaker_equlizer(buffer)
-
-    return []
+    return decoder[1](buffer)
 
 # Light
 
@@ -227,3 +223,24 @@ def decode_speaker_equlizer(buffer):
         'frequency_8k':        buffer[9],
     }
     return info
+
+
+# (category, function): (minimum frame length, decoder)
+_DECODERS = {
+    (GetBulbCategory.light.value, GetLightFunction.status.value):
+        (13, decode_light_info),
+    (GetBulbCategory.timer.value, GetTimerFunction.auto_light.value):
+        (10, decode_time_auto),
+    (GetBulbCategory.timer.value, GetTimerFunction.auto_music.value):
+        (10, decode_time_auto),
+    (GetBulbCategory.timer.value, GetTimerFunction.alarm_1.value):
+        (15, decode_time_alarm),
+    (GetBulbCategory.timer.value, GetTimerFunction.alarm_2.value):
+        (15, decode_time_alarm),
+    (GetBulbCategory.timer.value, GetTimerFunction.alarm_3.value):
+        (15, decode_time_alarm),
+    (GetBulbCategory.speaker.value, GetSpeakerFunction.volume.value):
+        (6, decode_speaker_volume),
+    (GetBulbCategory.speaker.value, GetSpeakerFunction.equalizer.value):
+        (10, decode_speaker_equlizer),
+}
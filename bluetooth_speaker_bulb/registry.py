@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import time
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+RSSI_HISTORY = 50
+
+
+class Registry():
+    """
+    On-disk registry of known bulbs, one JSON object per line keyed by mac.
+
+    A record holds name, model, BlueZ path, cached GATT handles, the last
+    decoded light/speaker state and a short RSSI history.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._records: dict[str, dict[str, Any]] = {}
+        self._dirty = False
+        self.load()
+
+    def load(self) -> None:
+        self._records = {}
+        if not os.path.exists(self._path):
+            return
+        with open(self._path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    _LOGGER.warning(f"Registry: skipping bad line in {self._path}")
+                    continue
+                self._records[record['address']] = record
+        _LOGGER.debug(f"Registry: loaded {len(self._records)} devices")
+
+    def save(self) -> None:
+        """Write the registry if it changed, atomically replacing the file"""
+        if not self._dirty:
+            return
+        tmp = f"{self._path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for record in self._records.values():
+                f.write(json.dumps(record, separators=(',', ':')))
+                f.write('\n')
+        os.replace(tmp, self._path)
+        self._dirty = False
+
+    def get(self, address: str) -> dict[str, Any] | None:
+        return self._records.get(address.upper())
+
+    def addresses(self) -> list[str]:
+        return list(self._records)
+
+    def update(self, address: str, **fields) -> dict[str, Any]:
+        """
+        Update fields of a record, creating it if needed
+
+        :param address: mac address
+        :param fields: fields to set
+        """
+        address = address.upper()
+        record = self._records.setdefault(address, {'address': address})
+        record.update(fields)
+        record['updated'] = time.time()
+        self._dirty = True
+        return record
+
+    def record_rssi(self, address: str, rssi: int, adapter: str = None) -> None:
+        """
+        :param adapter: adapter that heard the bulb, its last RSSI is kept per adapter
+        """
+        record = self._records.get(address.upper())
+        if record is None:
+            return
+        history = record.setdefault('rssi', [])
+        history.append([round(time.time(), 1), rssi])
+        del history[:-RSSI_HISTORY]
+        if adapter is not None:
+            record.setdefault('adapter_rssi', {})[adapter] = rssi
+        self._dirty = True
+
+    def adapter_rssi(self, address: str) -> dict[str, int]:
+        """
+        :return: adapter to last RSSI the bulb was heard with
+        """
+        record = self.get(address)
+        return dict(record.get('adapter_rssi', {})) if record else {}
+
+    def on_advertisement(self, device: "BLEDevice", rssi: int, adapter: str) -> None:
+        """Callback for BulbScanner.add_callback_on_advertisement"""
+        self.record_rssi(device.address, rssi, adapter)
+
+    def ble_device(self, address: str) -> "BLEDevice | None":
+        """
+        Rebuild a BLEDevice from the registry without scanning
+
+        :param address: mac address
+        """
+        from .adapters import RSSI_UNKNOWN
+        from .connection import make_ble_device
+
+        record = self.get(address)
+        if record is None:
+            return None
+        details = None
+        if record.get('path'):
+            details = {'path': record['path'], 'props': {}}
+        rssi = record['rssi'][-1][1] if record.get('rssi') else RSSI_UNKNOWN
+        return make_ble_device(record['address'], record.get('name'), details, rssi)
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import time
+import weakref
+from typing import AsyncIterator, Callable
+
+from bleak import BleakScanner
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+
+from .connection import MODEL_UNKNOWN, model_from_name
+
+_LOGGER = logging.getLogger(__name__)
+
+DEVICE_TTL: float = 120.0
+
+
+class ScanEntry():
+    """
+    Last advertisement seen from a device
+    """
+    __slots__ = ('device', 'model', 'rssi', 'last_seen')
+
+    def __init__(self, device: BLEDevice, model: str, rssi: int, last_seen: float) -> None:
+        self.device = device
+        self.model = model
+        self.rssi = rssi
+        self.last_seen = last_seen
+
+
+class BulbScanner():
+    """
+    Long lived scanner service.
+
+    Keeps an index of address to BLEDevice with RSSI and last seen time,
+    streams matching devices as advertisements arrive.
+    """
+
+    def __init__(self, adapter: str = None, ttl: float = DEVICE_TTL) -> None:
+        self._adapter = adapter
+        self._ttl = ttl
+        self._scanner: BleakScanner | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # started by find_device_by_address, stopped after the last lookup
+        self._for_lookups = False
+        self._lookups = 0
+        self._index: dict[str, ScanEntry] = {}
+        self._subscribers: list[asyncio.Queue] = []
+        self._waiters: dict[str, list[asyncio.Future]] = {}
+        self._advertisement_callbacks: list[Callable[[BLEDevice, int, str], None]] = []
+
+    def add_callback_on_advertisement(self, func: Callable[[BLEDevice, int, str], None]) -> None:
+        """
+        Register callbacks to be called with (device, rssi, adapter) for every advertisement
+        """
+        self._advertisement_callbacks.append(func)
+
+    async def start(self) -> None:
+        """Start scanning until stop is called"""
+        self._for_lookups = False
+        await self._start()
+
+    async def _start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._scanner is not None and self._loop is not loop:
+            # started on another, likely finished, event loop, its
+            # advertisements never reach this one
+            _LOGGER.debug("Scanner: restarting on the running event loop")
+            self._scanner = None
+        if self._scanner is not None:
+            return
+        self._loop = loop
+        kwargs = {}
+        if self._adapter is not None:
+            kwargs['adapter'] = self._adapter
+        self._scanner = BleakScanner(
+            detection_callback=self._detection_cb, **kwargs)
+        await self._scanner.start()
+        _LOGGER.debug(f"Scanner started on {self._adapter or 'default adapter'}")
+
+    async def stop(self) -> None:
+        if self._scanner is None:
+            return
+        scanner, self._scanner = self._scanner, None
+        self._for_lookups = False
+        if self._loop is asyncio.get_running_loop():
+            await scanner.stop()
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+
+    @property
+    def running(self) -> bool:
+        """Get running."""
+        return self._scanner is not None
+
+    @property
+    def adapter(self) -> str:
+        """Get adapter."""
+        return self._adapter
+
+    def _detection_cb(self, device: BLEDevice, advertisement_data: AdvertisementData) -> None:
+        address = device.address.upper()
+        model = model_from_name(device.name or advertisement_data.local_name)
+        rssi = advertisement_data.rssi
+        now = time.monotonic()
+        previous = self._index.get(address)
+        # a bulb streams again once it named itself or came back after the ttl
+        known = previous is not None and previous.model != MODEL_UNKNOWN \
+            and now - previous.last_seen <= self._ttl
+        self._index[address] = ScanEntry(device, model, rssi, now)
+
+        for func in self._advertisement_callbacks:
+            func(device, rssi, self._adapter)
+        for future in self._waiters.pop(address, []):
+            if not future.done():
+                future.set_result(device)
+        if model != MODEL_UNKNOWN and not known:
+            _LOGGER.info(f"found {model} with mac: {address}, rssi: {rssi}")
+            for queue in self._subscribers:
+                queue.put_nowait(self._index[address])
+
+    def _expire(self) -> None:
+        deadline = time.monotonic() - self._ttl
+        for address in [a for a, e in self._index.items() if e.last_seen < deadline]:
+            del self._index[address]
+
+    def get(self, address: str) -> ScanEntry | None:
+        """
+        Look up a device in the index
+
+        :param address: mac address
+        :return: entry or None if not seen within the ttl
+        """
+        entry = self._index.get(address.upper())
+        if entry is None or time.monotonic() - entry.last_seen > self._ttl:
+            return None
+        return entry
+
+    def devices(self) -> list[ScanEntry]:
+        """
+        :return: all known bulbs seen within the ttl
+        """
+        self._expire()
+        return [e for e in self._index.values() if e.model != MODEL_UNKNOWN]
+
+    async def find_device_by_address(self, address: str, timeout: float = 20.0) -> BLEDevice | None:
+        """
+        Answer from the index, otherwise wait for the next advertisement
+        from the address. A scan started for lookups stops after the last
+        one, unless start or stream asked for it meanwhile.
+        """
+        entry = self.get(address)
+        if entry is not None:
+            return entry.device
+        if not self.running or self._loop is not asyncio.get_running_loop():
+            await self._start()
+            self._for_lookups = True
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(address.upper(), []).append(future)
+        self._lookups += 1
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._lookups -= 1
+            waiters = self._waiters.get(address.upper(), [])
+            if future in waiters:
+                waiters.remove(future)
+            if self._for_lookups and not self._lookups and not self._subscribers:
+                await self.stop()
+
+    async def stream(self) -> AsyncIterator[ScanEntry]:
+        """
+        Async iterator of bulbs, known ones first then new ones as they
+        are advertised. Ends when the scanner is stopped.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for entry in self.devices():
+            queue.put_nowait(entry)
+        self._subscribers.append(queue)
+        try:
+            await self.start()
+            while True:
+                entry = await queue.get()
+                if entry is None:
+                    return
+                yield entry
+        finally:
+            self._subscribers.remove(queue)
+
+
+_SHARED_SCANNERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, BulbScanner]" = \
+    weakref.WeakKeyDictionary()
+
+
+def shared_scanner() -> BulbScanner:
+    """
+    :return: scanner of the running event loop used by find_device_by_address
+    """
+    loop = asyncio.get_running_loop()
+    scanner = _SHARED_SCANNERS.get(loop)
+    if scanner is None:
+        scanner = _SHARED_SCANNERS[loop] = BulbScanner()
+    return scanner
+
+
+async def stop_shared_scanner() -> None:
+    """Stop the scanner of the running event loop, if there is one"""
+    scanner = _SHARED_SCANNERS.get(asyncio.get_running_loop())
+    if scanner is not None:
+        await scanner.stop()
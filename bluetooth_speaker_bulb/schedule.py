@@ -0,0 +1,138 @@
+import asyncio
+import datetime
+import logging
+
+from .bulb import Bulb
+from .timer import ALARM_SLOTS
+
+_LOGGER = logging.getLogger(__name__)
+
+SYNC_IN_SYNC = "in_sync"
+SYNC_REPROGRAMMED = "reprogrammed"
+SYNC_FAILED = "failed"
+
+
+def _hour_minute(value) -> tuple:
+    if isinstance(value, datetime.time):
+        return (value.hour, value.minute)
+    hour, minute = value
+    return (int(hour), int(minute))
+
+
+class HostSchedule():
+    """
+    Host side schedule for one bulb, compiled into the bulb's own slots so
+    the bulb runs it without a live BLE command at the scheduled moment.
+    """
+
+    def __init__(self, light_on=None, light_off=None, music_on=None, music_off=None,
+                 alarms: list = None) -> None:
+        """
+        :param light_on: time the light turns on, datetime.time or (hour, minute)
+        :param light_off: time the light turns off, set both or neither
+        :param music_on: time the music turns on
+        :param music_off: time the music turns off, set both or neither
+        :param alarms: up to three wake-up times
+        """
+        for name, (start, stop) in (('light', (light_on, light_off)),
+                                    ('music', (music_on, music_off))):
+            if (start is None) != (stop is None):
+                raise ValueError(f"{name}_on and {name}_off must be set together")
+        alarms = alarms or []
+        if len(alarms) > len(ALARM_SLOTS):
+            raise ValueError(
+                f"At most {len(ALARM_SLOTS)} alarms fit on a bulb, got {len(alarms)}")
+        self.light = (light_on, light_off)
+        self.music = (music_on, music_off)
+        self.alarms = alarms
+
+    def compile(self) -> dict:
+        """
+        :return: timer schedule (see :class:`.Timer`)
+        """
+        schedule = {}
+        for slot, (start, stop) in (('auto_light', self.light), ('auto_music', self.music)):
+            if start is None or stop is None:
+                schedule[slot] = {'on': False}
+                continue
+            start_hour, start_minute = _hour_minute(start)
+            stop_hour, stop_minute = _hour_minute(stop)
+            schedule[slot] = {
+                'on':           True,
+                'start_hour':   start_hour,
+                'start_minute': start_minute,
+                'stop_hour':    stop_hour,
+                'stop_minute':  stop_minute,
+            }
+        for i, slot in enumerate(ALARM_SLOTS):
+            if i < len(self.alarms):
+                hour, minute = _hour_minute(self.alarms[i])
+                schedule[slot] = {'on': True, 'hour': hour, 'minute': minute}
+            else:
+                schedule[slot] = {'on': False}
+        return schedule
+
+
+class ScheduleSync():
+    """
+    Push host schedules onto a fleet, reprogramming only bulbs that drifted
+    """
+
+    def __init__(self, concurrency: int = 4, disconnect: bool = True) -> None:
+        """
+        :param concurrency: bulbs synced at the same time
+        :param disconnect: drop the link after a bulb is synced, bulbs with a
+            keepalive stay connected
+        """
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._disconnect = disconnect
+
+    async def sync_bulb(self, bulb: Bulb, schedule: HostSchedule) -> str:
+        """
+        Read back the bulb schedule, reprogram and verify if it drifted
+
+        :return: SYNC_IN_SYNC, SYNC_REPROGRAMMED or SYNC_FAILED
+        """
+        compiled = schedule.compile()
+        async with self._semaphore:
+            try:
+                if not await bulb.update_timer():
+                    return SYNC_FAILED
+                if bulb.schedule_matches(compiled):
+                    return SYNC_IN_SYNC
+                if not await bulb.set_schedule(compiled):
+                    return SYNC_FAILED
+                if await bulb.update_timer() and bulb.schedule_matches(compiled):
+                    return SYNC_REPROGRAMMED
+                _LOGGER.warning(f"Schedule sync: verify failed, {bulb.schedule}")
+                return SYNC_FAILED
+            finally:
+                # a bulb kept alive belongs to a gateway, client or worker
+                # that wants its link up
+                if self._disconnect and not bulb.keepalive:
+                    await bulb.disconnect()
+
+    async def sync(self, bulbs: dict[str, Bulb], schedules: dict[str, HostSchedule]) -> dict[str, str]:
+        """
+        Sync all bulbs that have a schedule
+
+        :param bulbs: mac address to Bulb
+        :param schedules: mac address to HostSchedule
+        :return: mac address to sync result
+        """
+        addresses = [a for a in schedules if a in bulbs]
+        results = await asyncio.gather(
+            *(self.sync_bulb(bulbs[a], schedules[a]) for a in addresses),
+            return_exceptions=True
+        )
+        report = {}
+        for address, result in zip(addresses, results):
+            if isinstance(result, Exception):
+                _LOGGER.error(f"Schedule sync: {address} failed: {result}")
+                result = SYNC_FAILED
+            report[address] = result
+        _LOGGER.info(
+            f"Schedule sync: {sum(r == SYNC_REPROGRAMMED for r in report.values())} reprogrammed, "
+            f"{sum(r == SYNC_IN_SYNC for r in report.values())} in sync, "
+            f"{sum(r == SYNC_FAILED for r in report.values())} failed")
+        return report
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+from typing import Callable
+
+from .bulb import Bulb
+from .connection import make_ble_device
+from .const import *
+from .protocol import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SimulatedBulbClient():
+    """
+    Simulated BleakClient that keeps bulb state and answers requests with
+    notifications like a real bulb. Attach it with Connection.attach_client.
+    """
+
+    def __init__(self, address: str, name: str = "bluetooth_speaker_bulb",
+                 latency: float = 0.0) -> None:
+        """
+        :param address: mac address
+        :param name: device name
+        :param latency: seconds before the bulb answers a request
+        """
+        self.address = address
+        self.is_connected = True
+        self._name = name
+        self._latency = latency
+        self._notify_cb: Callable = None
+        self._last_response = bytearray()
+        self.writes = 0
+        self.light = {'r': 0, 'g': 0, 'b': 0, 'cold': 0x75, 'warm': 0x8a,
+                      'brightness': 0x8d, 'on': 1, 'effect': 0}
+        self.volume = 0x10
+        self.equalizer = [0x32] * 5
+        self.timer = {f.value: [0, 12, 0, 12, 0] for f in
+                      (GetTimerFunction.auto_light, GetTimerFunction.auto_music)}
+        self.timer.update({f.value: [0, 12, 0, 0] for f in
+                           (GetTimerFunction.alarm_1, GetTimerFunction.alarm_2,
+                            GetTimerFunction.alarm_3)})
+
+    async def start_notify(self, handle, callback: Callable) -> None:
+        self._notify_cb = callback
+
+    async def disconnect(self) -> bool:
+        self.is_connected = False
+        return True
+
+    async def read_gatt_char(self, char, **kwargs) -> bytearray:
+        if char == UUID_CHARACTERISTIC.UUID_CHARACTERISTIC_DEVICE_NAME.value:
+            return bytearray(self._name.encode('utf-8'))
+        return bytearray(self._last_response)
+
+    async def write_gatt_char(self, char, data, response: bool = False) -> None:
+        self.writes += 1
+        if not verify_frame(data):
+            _LOGGER.debug(f"Simulated {self.address}: dropping bad frame {bytes(data).hex()}")
+            return
+        category, function, payload = data[3], data[4], list(data[5:5 + data[2]])
+        if payload == [Commands.REQ_DATA.value] and self._answer(category, function):
+            return
+        if category == SetBulbCategory.light.value:
+            self._set_light(function, payload)
+        elif category == SetBulbCategory.speaker.value:
+            self._set_speaker(function, payload)
+        elif category == SetBulbCategory.timer.value:
+            self._set_timer(function, payload)
+
+    def _answer(self, category: int, function: int) -> bool:
+        get_category = category | 0x80
+        light = self.light
+        if category == SetBulbCategory.light.value \
+                and function == GetLightFunction.status.value:
+            data = [light['r'], light['g'], light['b'], light['cold'], light['warm'],
+                    light['brightness'], light['on'], light['effect'], 0x50]
+        elif category == SetBulbCategory.speaker.value \
+                and function == GetSpeakerFunction.volume.value:
+            data = [self.volume]
+        elif category == SetBulbCategory.speaker.value \
+                and function == GetSpeakerFunction.equalizer.value:
+            data = self.equalizer
+        elif category == SetBulbCategory.timer.value and function in self.timer:
+            slot = self.timer[function]
+            if len(slot) == 4:
+                on, hour, minute, _ = slot
+                data = [0, 0x14, 0x10, 1, 1, 1, hour, minute, 0, on]
+            else:
+                data = slot
+        else:
+            return False
+        self._last_response = encode_msg(get_category, function, data)
+        if self._notify_cb is not None:
+            asyncio.get_running_loop().call_later(
+                self._latency, self._notify_cb, 0, bytearray(self._last_response))
+        return True
+
+    def _set_light(self, function: int, payload: list) -> None:
+        light = self.light
+        if function == SetLightFunction.brightness.value:
+            light['brightness'] = payload[0]
+        elif function == SetLightFunction.color.value:
+            light['r'], light['g'], light['b'] = payload[:3]
+            light['cold'] = light['warm'] = 0
+        elif function == SetLightFunction.power.value:
+            light['on'] = payload[0]
+        elif function == SetLightFunction.effect.value:
+            light['effect'] = payload[0]
+        elif function == SetLightFunction.white_intensity.value:
+            light['cold'], light['warm'] = payload[0], 0xff - payload[0]
+        elif function == SetLightFunction.white.value:
+            light['cold'], light['warm'] = 0x75, 0x8a
+
+    def _set_speaker(self, function: int, payload: list) -> None:
+        if function == SetSpeakerFunction.volume.value:
+            self.volume = payload[0]
+        elif function == SetSpeakerFunction.speaker_effect.value:
+            levels = SpeakerEffectEqualizer[SpeakerEffect(payload[0]).name].value
+            self.equalizer = list(levels.values())
+        elif SetSpeakerFunction.frequency_80.value <= function \
+                <= SetSpeakerFunction.frequency_8k.value:
+            self.equalizer[function - SetSpeakerFunction.frequency_80.value] = payload[0]
+
+    def _set_timer(self, function: int, payload: list) -> None:
+        name = SetTimerFunction(function).name
+        slot = next(f for f in GetTimerFunction if name.startswith(f"{f.name}_"))
+        action = name[len(slot.name) + 1:]
+        state = self.timer[slot.value]
+        if action in ('toggle_on', 'toggle_off'):
+            state[0] = 1 if action == 'toggle_on' else 0
+        elif action in ('timer_start', 'time'):
+            state[1:3] = payload[:2]
+        elif action == 'timer_stop':
+            state[3:5] = payload[:2]
+
+
+async def create_simulated_bulb(address: str, latency: float = 0.0, **kwargs) -> Bulb:
+    """
+    Create a Bulb backed by a SimulatedBulbClient
+
+    :param address: mac address
+    :param latency: seconds before the simulated bulb answers a request
+    :param kwargs: passed to Bulb
+    """
+    bulb = Bulb(make_ble_device(address, "bluetooth_speaker_bulb"), **kwargs)
+    await bulb._connection.attach_client(SimulatedBulbClient(address, latency=latency))
+    return bulb
+
+
+class SimulatedMessage():
+    """MQTT message of the simulated broker"""
+
+    def __init__(self, topic: str, payload: bytes) -> None:
+        self.topic = topic
+        self.payload = payload
+
+
+class SimulatedBroker():
+    """
+    In-process stand-in for an MQTT broker and client, same interface as
+    aiomqtt.Client for publish, subscribe and messages
+    """
+
+    def __init__(self) -> None:
+        self.retained: dict[str, bytes] = {}
+        self.published: list[tuple[str, bytes, bool]] = []
+        self._subscriptions: list[str] = []
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    @staticmethod
+    def matches(pattern: str, topic: str) -> bool:
+        pattern_parts = pattern.split('/')
+        topic_parts = topic.split('/')
+        for i, part in enumerate(pattern_parts):
+            if part == '#':
+                return True
+            if i >= len(topic_parts) or (part != '+' and part != topic_parts[i]):
+                return False
+        return len(pattern_parts) == len(topic_parts)
+
+    async def publish(self, topic: str, payload=None, qos: int = 0, retain: bool = False) -> None:
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        self.published.append((topic, payload, retain))
+        if retain:
+            self.retained[topic] = payload
+        if any(self.matches(p, topic) for p in self._subscriptions):
+            self._queue.put_nowait(SimulatedMessage(topic, payload))
+
+    async def subscribe(self, topic: str, qos: int = 0) -> None:
+        self._subscriptions.append(topic)
+
+    @property
+    async def messages(self):
+        while True:
+            yield await self._queue.get()
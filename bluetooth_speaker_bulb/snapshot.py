@@ -0,0 +1,68 @@
+import struct
+from typing import Iterator, NamedTuple
+
+# timestamp, r, g, b, cold, warm, brightness, on, effect_id: 16 bytes
+LIGHT_RECORD = struct.Struct('<d8B')
+
+
+class LightSnapshot(NamedTuple):
+    """
+    Immutable light state, 16 bytes when packed with to_bytes
+    """
+    timestamp: float
+    r: int
+    g: int
+    b: int
+    cold: int
+    warm: int
+    brightness: int
+    on: int
+    effect_id: int
+
+    def to_bytes(self) -> bytes:
+        return LIGHT_RECORD.pack(*self)
+
+    @classmethod
+    def from_bytes(cls, buffer, offset: int = 0) -> "LightSnapshot":
+        return cls._make(LIGHT_RECORD.unpack_from(buffer, offset))
+
+
+class LightSnapshots():
+    """
+    Array backed store of light snapshots, LIGHT_RECORD.size bytes each.
+    Snapshots are packed on append and unpacked on access.
+    """
+    __slots__ = ('_buffer',)
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+    def append(self, snapshot: LightSnapshot) -> int:
+        """
+        :return: index of the snapshot
+        """
+        self._buffer += LIGHT_RECORD.pack(*snapshot)
+        return len(self) - 1
+
+    def __setitem__(self, index: int, snapshot: LightSnapshot) -> None:
+        if not -len(self) <= index < len(self):
+            raise IndexError("snapshot index out of range")
+        LIGHT_RECORD.pack_into(self._buffer, (index % len(self)) * LIGHT_RECORD.size, *snapshot)
+
+    def __getitem__(self, index: int) -> LightSnapshot:
+        if not -len(self) <= index < len(self):
+            raise IndexError("snapshot index out of range")
+        return LightSnapshot.from_bytes(self._buffer, (index % len(self)) * LIGHT_RECORD.size)
+
+    def __len__(self) -> int:
+        return len(self._buffer) // LIGHT_RECORD.size
+
+    def __iter__(self) -> Iterator[LightSnapshot]:
+        for values in LIGHT_RECORD.iter_unpack(self._buffer):
+            yield LightSnapshot._make(values)
+
+    @property
+    def nbytes(self) -> int:
+        """Get size of the packed snapshots."""
+        return len(self._buffer)
+
@@ -8,18 +8,33 @@ _LOGGER = logging.getLogger(__name__)
 DATA_VOLUME = 0
 DATA_EQ = 1
 
+EQUALIZER_BANDS = ('frequency_80', 'frequency_200', 'frequency_500',
+                   'frequency_2k', 'frequency_8k')
+
+# equalizer levels of every speaker effect, as tuples in band order
+_EFFECT_LEVELS = {
+    tuple(effect.value[band] for band in EQUALIZER_BANDS): effect.name
+    for effect in SpeakerEffectEqualizer
+}
+
 
 class Speaker():
     """
     Class for speaker part of bulb
     """
+    __slots__ = ('_mute', '_volume', '_equalizer', '_speaker_effect', '_effect',
+                 '_history')
 
-    def __init__(self) -> None:
-        self._raw_data: list = None
+    def __init__(self, history=None) -> None:
+        """
+        :param history: StateHistory recording every update, optional
+        """
+        self._history = history
         self._mute: bool = None
         self._volume: int = None
-        self._equalizer: list = None
+        self._equalizer: tuple = None
         self._speaker_effect: str = None
+        self._effect: str = None
 
     def update(self, raw_data: list):
         if not raw_data:
@@ -34,11 +49,15 @@ class Speaker():
         self._volume = \
             int(raw_data[DATA_VOLUME]['volume'] * 100 / steps)
 
-        self._equalizer = raw_data[DATA_EQ]
-        self._speaker_effect = None
-        for speaker_effect in SpeakerEffectEqualizer:
-            if speaker_effect.value == self._equalizer:
-                self._speaker_effect = speaker_effect.name
+        equalizer = raw_data[DATA_EQ] if len(raw_data) > DATA_EQ else None
+        if isinstance(equalizer, dict) and all(band in equalizer for band in EQUALIZER_BANDS):
+            self._equalizer = tuple(equalizer[band] for band in EQUALIZER_BANDS)
+        else:
+            _LOGGER.debug(f"Updating speaker, bad equalizer: {equalizer}")
+            self._equalizer = None
+        self._speaker_effect = _EFFECT_LEVELS.get(self._equalizer)
+        if self._history is not None:
+            self._history.record_speaker(self)
 
     def set_speaker_level(self, level, function=SetSpeakerFunction.volume.name):
         """
@@ -91,4 +110,11 @@ class Speaker():
     @property
     def equalizer(self):
         """Get equalizer """
+        if self._equalizer is None:
+            return None
+        return dict(zip(EQUALIZER_BANDS, self._equalizer))
+
+    @property
+    def equalizer_levels(self) -> tuple:
+        """Get equalizer levels in EQUALIZER_BANDS order """
         return self._equalizer
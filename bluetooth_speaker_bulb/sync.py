@@ -0,0 +1,217 @@
+"""
+Synchronous client for scripts and threaded servers
+
+    with SyncClient(registry="bulbs.jsonl") as client:
+        bulb = client.bulb("AA:BB:CC:DD:EE:FF")
+        bulb.set_brightness(brightness=200)
+        print(bulb.state)
+
+One background thread runs a long lived event loop holding a Bulb per
+mac, so connections stay warm between calls. Calls may come from any
+thread, each blocks until its result or its timeout.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Any
+
+from .bulb import METHODS
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SyncClient():
+    """
+    Dispatches Bulb calls from any thread to a dedicated event loop thread
+    """
+
+    def __init__(self, timeout: float = 30.0, concurrency: int = 8, registry: str = None,
+                 keepalive: bool = True, bulb_timeout: int = 20, retries: int = 3,
+                 simulate: float = None) -> None:
+        """
+        :param timeout: default seconds a call may take, including the wait for a slot
+        :param concurrency: calls running on the loop at once, across all bulbs
+        :param registry: registry file to create bulbs from without scanning
+        :param keepalive: keep links up between calls
+        :param bulb_timeout: Bulb connection timeout
+        :param retries: Bulb connection retries
+        :param simulate: use simulated bulbs with this latency instead
+        """
+        self._timeout = timeout
+        self._concurrency = concurrency
+        self._registry_path = registry
+        self._keepalive = keepalive
+        self._bulb_timeout = bulb_timeout
+        self._retries = retries
+        self._simulate = simulate
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._bulbs: dict = {}
+        self._creating: dict[str, asyncio.Lock] = {}
+        self._semaphore: asyncio.Semaphore | None = None
+        self._registry = None
+
+    def start(self) -> None:
+        """Start the loop thread, done on the first call if not called"""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            started = threading.Event()
+            self._loop = asyncio.new_event_loop()
+
+            def run() -> None:
+                asyncio.set_event_loop(self._loop)
+                self._semaphore = asyncio.Semaphore(self._concurrency)
+                self._loop.call_soon(started.set)
+                self._loop.run_forever()
+
+            self._thread = threading.Thread(
+                target=run, name="bluetooth_speaker_bulb", daemon=True)
+            self._thread.start()
+            started.wait()
+
+    def _run(self, coro, timeout: float = None) -> Any:
+        """
+        Run a coroutine on the loop and wait for its result
+
+        :param timeout: seconds, default the client timeout
+        """
+        self.start()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("SyncClient called from its own loop, await the Bulb instead")
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        timeout = self._timeout if timeout is None else timeout
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"call did not finish in {timeout}s") from None
+
+    async def _get_bulb(self, mac: str):
+        bulb = self._bulbs.get(mac)
+        if bulb is not None:
+            return bulb
+        lock = self._creating.setdefault(mac, asyncio.Lock())
+        async with lock:
+            if mac not in self._bulbs:
+                self._bulbs[mac] = await self._create_bulb(mac)
+        return self._bulbs[mac]
+
+    async def _create_bulb(self, mac: str):
+        if self._simulate is not None:
+            from .simulator import create_simulated_bulb
+            return await create_simulated_bulb(mac, latency=self._simulate)
+
+        from .bulb import Bulb
+        from .connection import find_device_by_address
+        from .registry import Registry
+
+        bulb = None
+        if self._registry_path:
+            if self._registry is None:
+                self._registry = Registry(self._registry_path)
+            bulb = Bulb.from_registry(self._registry, mac, refresh=False,
+                                      timeout=self._bulb_timeout, retries=self._retries)
+        if bulb is None:
+            ble_device = await find_device_by_address(mac)
+            if ble_device is None:
+                raise KeyError(f"bulb {mac} not found")
+            bulb = Bulb(ble_device, timeout=self._bulb_timeout, retries=self._retries)
+        if self._keepalive:
+            bulb.start_keepalive()
+        return bulb
+
+    async def _call(self, mac: str, method: str, args: tuple, kwargs: dict) -> Any:
+        async with self._semaphore:
+            bulb = await self._get_bulb(mac)
+            return await getattr(bulb, method)(*args, **kwargs)
+
+    def call(self, mac: str, method: str, *args, timeout: float = None, **kwargs) -> Any:
+        """
+        Run a Bulb method and wait for its result
+
+        :param mac: mac address
+        :param method: Bulb method name, see bulb.METHODS
+        :param timeout: seconds, default the client timeout
+        """
+        if method not in METHODS:
+            raise ValueError(f"unknown method {method}")
+        return self._run(self._call(mac.upper(), method, args, kwargs), timeout)
+
+    def state(self, mac: str, timeout: float = None) -> dict:
+        """
+        :return: last known state, the bulb is created if needed but not read
+        """
+        async def state():
+            return (await self._get_bulb(mac.upper())).state
+        return self._run(state(), timeout)
+
+    def bulb(self, mac: str) -> "SyncBulb":
+        return SyncBulb(self, mac.upper())
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Disconnect all bulbs and stop the loop thread"""
+        with self._start_lock:
+            if self._thread is None:
+                return
+            future = asyncio.run_coroutine_threadsafe(
+                self._disconnect_all(timeout), self._loop)
+            try:
+                future.result(timeout + 1)
+            except concurrent.futures.TimeoutError:
+                _LOGGER.warning("SyncClient: disconnect did not finish in time")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._loop.close()
+            self._thread = None
+            self._loop = None
+            self._bulbs = {}
+            self._creating = {}
+
+    async def _disconnect_all(self, timeout: float) -> None:
+        from .scanner import stop_shared_scanner
+
+        await asyncio.wait_for(
+            asyncio.gather(*(b.disconnect() for b in self._bulbs.values()),
+                           stop_shared_scanner(), return_exceptions=True),
+            timeout)
+
+    def __enter__(self) -> "SyncClient":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class SyncBulb():
+    """
+    Blocking view of one bulb of a SyncClient, Bulb methods take the
+    same arguments plus an optional timeout
+    """
+
+    def __init__(self, client: SyncClient, mac: str) -> None:
+        self._client = client
+        self._mac = mac
+
+    def __getattr__(self, name: str):
+        if name not in METHODS:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+        def call(*args, timeout: float = None, **kwargs):
+            return self._client.call(self._mac, name, *args, timeout=timeout, **kwargs)
+        call.__name__ = name
+        return call
+
+    @property
+    def address(self) -> str:
+        """Get address."""
+        return self._mac
+
+    @property
+    def state(self) -> dict:
+        """Get last known state."""
+        return self._client.state(self._mac)
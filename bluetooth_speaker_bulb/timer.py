@@ -0,0 +1,171 @@
+import logging
+
+from .const import *
+from .protocol import *
+
+_LOGGER = logging.getLogger(__name__)
+
+AUTO_SLOTS = (GetTimerFunction.auto_light.name, GetTimerFunction.auto_music.name)
+ALARM_SLOTS = (GetTimerFunction.alarm_1.name,
+               GetTimerFunction.alarm_2.name,
+               GetTimerFunction.alarm_3.name)
+
+
+class Timer():
+    """
+    Class for timer part of bulb, auto light, auto music and three alarms
+
+    Schedule slots:
+    auto_light, auto_music: {'on', 'start_hour', 'start_minute', 'stop_hour', 'stop_minute'}
+    alarm_1..3:             {'on', 'hour', 'minute'}
+    """
+    __slots__ = ('_slots',)
+
+    def __init__(self) -> None:
+        self._slots: dict[str, dict] = {}
+
+    def update(self, raw_data: list):
+        if not raw_data:
+            _LOGGER.debug(f"Updating timer failed, raw_data: {raw_data}")
+            return
+        _LOGGER.debug(f"Updating timer, raw_data: {raw_data}")
+        for info in raw_data:
+            if 'function' in info:
+                self._slots[GetTimerFunction(info['function']).name] = {
+                    'on':           bool(info['on']),
+                    'start_hour':   info['start_hour'],
+                    'start_minute': info['start_minut'],
+                    'stop_hour':    info['stop_hour'],
+                    'stop_minute':  info['stop_minute'],
+                }
+            elif 'alarm_no' in info:
+                self._slots[GetTimerFunction(info['alarm_no']).name] = {
+                    'on':       bool(info['alarm_on']),
+                    'hour':     info['alarm_hour'],
+                    'minute':   info['alarm_minute'],
+                }
+
+    def set_timer(self, function: SetTimerFunction, data=[]):
+        """
+        Encode one timer function
+
+        :param function: timer function (see :class:`.SetTimerFunction`)
+        :param data: [hour, minute] for time functions, empty for toggles
+        """
+        return encode_msg(
+            SetBulbCategory.timer.value,
+            function.value,
+            data
+        )
+
+    def set_auto(self, slot: str, on: bool = None, start: tuple = None, stop: tuple = None) -> list:
+        """
+        Set auto light or auto music
+
+        :param slot: auto_light or auto_music
+        :param on: enable or disable
+        :param start: (hour, minute)
+        :param stop: (hour, minute)
+        :return: list of encoded msgs, pass each to sent once the bulb took it
+        """
+        msgs = []
+        if start is not None:
+            msgs.append(self.set_timer(
+                SetTimerFunction[f"{slot}_timer_start"], list(start)))
+        if stop is not None:
+            msgs.append(self.set_timer(
+                SetTimerFunction[f"{slot}_timer_stop"], list(stop)))
+        if on is not None:
+            toggle = 'toggle_on' if on else 'toggle_off'
+            msgs.append(self.set_timer(SetTimerFunction[f"{slot}_{toggle}"]))
+        return msgs
+
+    def set_alarm(self, slot: str, on: bool = None, time: tuple = None) -> list:
+        """
+        Set an alarm
+
+        :param slot: alarm_1, alarm_2 or alarm_3
+        :param on: enable or disable
+        :param time: (hour, minute)
+        :return: list of encoded msgs, pass each to sent once the bulb took it
+        """
+        msgs = []
+        if time is not None:
+            msgs.append(self.set_timer(
+                SetTimerFunction[f"{slot}_time"], list(time)))
+        if on is not None:
+            toggle = 'toggle_on' if on else 'toggle_off'
+            msgs.append(self.set_timer(SetTimerFunction[f"{slot}_{toggle}"]))
+        return msgs
+
+    def sent(self, msg) -> None:
+        """
+        Apply a msg from set_auto, set_alarm or diff to the known state,
+        call it once the bulb took the msg
+
+        :param msg: encoded msg
+        """
+        name = SetTimerFunction(msg[4]).name
+        slot = next(s for s in AUTO_SLOTS + ALARM_SLOTS if name.startswith(f"{s}_"))
+        action = name[len(slot) + 1:]
+        data = list(msg[5:-1])
+        state = self._slots.setdefault(slot, {})
+        if action in ('toggle_on', 'toggle_off'):
+            state['on'] = action == 'toggle_on'
+        elif action == 'timer_start':
+            state['start_hour'], state['start_minute'] = data
+        elif action == 'timer_stop':
+            state['stop_hour'], state['stop_minute'] = data
+        elif action == 'time':
+            state['hour'], state['minute'] = data
+
+    def diff(self, schedule: dict) -> list:
+        """
+        Encode only what differs between the known state and schedule
+
+        :param schedule: slot name to slot dict, partial slots are fine
+        :return: list of encoded msgs, the known state is left as it is
+        """
+        msgs = []
+        for slot, wanted in schedule.items():
+            current = self._slots.get(slot, {})
+
+            def changed(*keys):
+                return any(k in wanted and wanted[k] != current.get(k) for k in keys)
+
+            def pair(a, b):
+                return (wanted.get(a, current.get(a, 0)), wanted.get(b, current.get(b, 0)))
+
+            on = wanted['on'] if changed('on') else None
+            if slot in AUTO_SLOTS:
+                msgs += self.set_auto(
+                    slot,
+                    on=on,
+                    start=pair('start_hour', 'start_minute')
+                    if changed('start_hour', 'start_minute') else None,
+                    stop=pair('stop_hour', 'stop_minute')
+                    if changed('stop_hour', 'stop_minute') else None,
+                )
+            elif slot in ALARM_SLOTS:
+                msgs += self.set_alarm(
+                    slot,
+                    on=on,
+                    time=pair('hour', 'minute')
+                    if changed('hour', 'minute') else None,
+                )
+            else:
+                _LOGGER.warning(f"Timer: unknown slot {slot}")
+        return msgs
+
+    def matches(self, schedule: dict) -> bool:
+        """Check if the known state already has schedule"""
+        return all(
+            self._slots.get(slot, {}).get(k) == v
+            for slot, wanted in schedule.items()
+            for k, v in wanted.items()
+        )
+
+    @property
+    def schedule(self) -> dict:
+        """Get schedule."""
+        return {slot: dict(state) for slot, state in self._slots.items()}
@@ -20,9 +20,15 @@ setuptools.setup(
     license='MIT',
     packages=['bluetooth_speaker_bulb'],
     install_requires=[
-        'bleak>=0.15.0',
-        'webcolors'
+        'bleak>=0.18.0',
+        'bleak-retry-connector>=2.1.3',
     ],
+    extras_require={
+        'gateway': ['aiohttp'],
+        'mqtt': ['aiomqtt'],
+        'numpy': ['numpy'],
+        'test': ['pytest', 'hypothesis'],
+    },
     include_package_data=True,
     entry_points={
         'console_scripts': [
@@ -0,0 +1,79 @@
+"""
+Tests of CircuitBreaker with a fake clock
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from bluetooth_speaker_bulb import breaker as breaker_module
+from bluetooth_speaker_bulb.breaker import BreakerState, CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=0.0)
+    monkeypatch.setattr(breaker_module, 'time', SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_opens_after_threshold_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, cool_down=10)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == BreakerState.OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == BreakerState.CLOSED
+
+
+def test_half_open_lets_a_single_probe_through(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, cool_down=10)
+    breaker.record_failure()
+    clock.value = 9.9
+    assert not breaker.allow()
+    clock.value = 10
+    assert breaker.state == BreakerState.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_failed_probe_opens_again_for_a_full_cool_down(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, cool_down=10)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.value = 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == BreakerState.OPEN
+    clock.value = 19
+    assert not breaker.allow()
+    clock.value = 20
+    assert breaker.allow()
+
+
+def test_successful_probe_closes(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, cool_down=10)
+    breaker.record_failure()
+    clock.value = 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == BreakerState.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_cancelled_probe_frees_the_probe(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, cool_down=10)
+    breaker.record_failure()
+    clock.value = 10
+    assert breaker.allow()
+    breaker.record_cancelled()
+    assert breaker.state == BreakerState.HALF_OPEN
+    assert breaker.allow()
@@ -0,0 +1,28 @@
+"""
+Tests of Bulb against a simulated bulb
+"""
+import asyncio
+
+from bluetooth_speaker_bulb.simulator import create_simulated_bulb
+
+
+def test_color_on_a_bulb_not_read_yet():
+    async def run():
+        bulb = await create_simulated_bulb("AA:BB:CC:DD:EE:01")
+        assert await bulb.turn_on(rgb_color=[10, 20, 30])
+        return bulb._connection._client.light
+
+    light = asyncio.run(run())
+    assert (light['r'], light['g'], light['b']) == (10, 20, 30)
+
+
+def test_color_keeps_the_known_brightness():
+    async def run():
+        bulb = await create_simulated_bulb("AA:BB:CC:DD:EE:01")
+        assert await bulb.set_brightness(40)
+        assert await bulb.update_light()
+        assert await bulb.set_color_rgb([1, 2, 3])
+        assert await bulb.update_light()
+        return bulb.state
+
+    assert asyncio.run(run())['brightness'] == 40
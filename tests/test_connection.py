@@ -0,0 +1,56 @@
+"""
+Tests of the background supervisor of Connection
+"""
+import asyncio
+
+from bluetooth_speaker_bulb.connection import Connection, make_ble_device
+
+
+class CountingConnection(Connection):
+    """Connection whose connect only counts and takes a while"""
+
+    def __init__(self) -> None:
+        super().__init__(make_ble_device("AA:BB:CC:DD:EE:FF", "test"), timeout=5, retries=1)
+        self.connects = 0
+
+    async def connect(self, num_tries: int = 3) -> bool:
+        self.connects += 1
+        self._ready.clear()
+        await asyncio.sleep(0.05)
+        self._ready.set()
+        return True
+
+
+def test_commands_during_reconnect_do_not_restart_it():
+    async def run():
+        connection = CountingConnection()
+        connection.start_supervisor()
+        assert await connection.ensure_connected()
+        assert connection.connects == 1
+
+        # one drop, commands keep arriving while the supervisor reconnects
+        connection._link_lost()
+        results = []
+        for _ in range(10):
+            results.append(asyncio.create_task(connection.ensure_connected()))
+            await asyncio.sleep(0.01)
+        assert all(await asyncio.gather(*results))
+        await asyncio.sleep(0.1)
+        await connection.stop_supervisor()
+        return connection.connects
+
+    assert asyncio.run(run()) == 2
+
+
+def test_supervisor_skips_a_link_that_is_already_up():
+    async def run():
+        connection = CountingConnection()
+        connection.start_supervisor()
+        assert await connection.ensure_connected()
+        # a late wake up with the link ready does not reconnect
+        connection._reconnect.set()
+        await asyncio.sleep(0.1)
+        await connection.stop_supervisor()
+        return connection.connects
+
+    assert asyncio.run(run()) == 1
@@ -0,0 +1,51 @@
+"""
+Tests of the sharded fleet with simulated bulbs
+"""
+import asyncio
+
+import pytest
+
+from bluetooth_speaker_bulb.fleet import Fleet, plan_shards, shard_of
+
+MACS = [f"00:00:00:00:00:{i:02X}" for i in range(4)]
+
+
+def test_plan_shards_places_bulbs_on_the_adapter_hearing_them_best():
+    rssi = {MACS[0]: {'hci0': -90, 'hci1': -40}, MACS[1]: {'hci0': -40, 'hci1': -90}}
+    plan = plan_shards(MACS[:3], 2, ['hci0', 'hci1'], rssi)
+    assert [spec['adapters'] for spec in plan] == [['hci0'], ['hci1']]
+    assert MACS[1] in plan[0]['addresses']
+    assert MACS[0] in plan[1]['addresses']
+    # never heard, placed by mac hash
+    assert MACS[2] in plan[shard_of(MACS[2], 2)]['addresses']
+
+
+def test_call_to_a_lost_worker_fails_at_once():
+    async def run():
+        fleet = Fleet(MACS, shards=2, simulate=0.0)
+        await fleet.start()
+        try:
+            assert await fleet.call(MACS[0], 'set_brightness', brightness=10)
+            shard = fleet.routes[MACS[0]]
+            fleet._processes[shard].kill()
+            await asyncio.sleep(0.5)
+            with pytest.raises(RuntimeError):
+                await asyncio.wait_for(fleet.call(MACS[0], 'update'), 5)
+        finally:
+            await fleet.stop()
+
+    asyncio.run(run())
+
+
+def test_rssi_from_workers_is_saved_to_the_registry(tmp_path):
+    from bluetooth_speaker_bulb.registry import Registry
+
+    path = str(tmp_path / "bulbs.jsonl")
+    registry = Registry(path)
+    registry.update(MACS[0], name="bluetooth_speaker_bulb")
+    registry.save()
+
+    fleet = Fleet([MACS[0]], shards=1, registry=path, adapters=['hci0'])
+    fleet._dispatch(0, ('rssi', [(MACS[0], 'hci0', -55), (MACS[3], 'hci0', -40)]))
+    assert Registry(path).adapter_rssi(MACS[0]) == {'hci0': -55}
+    assert Registry(path).get(MACS[3]) is None
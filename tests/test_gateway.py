@@ -0,0 +1,108 @@
+"""
+Tests of Gateway request coalescing
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from bluetooth_speaker_bulb.gateway import Gateway  # noqa: E402
+
+MAC = "AA:BB:CC:DD:EE:01"
+
+
+class FakeBulb():
+    """Records the calls it runs"""
+
+    def __init__(self) -> None:
+        self.address = MAC
+        self.state = {}
+        self.calls = []
+
+    def add_callback_on_state_changed(self, func) -> None:
+        pass
+
+    async def set_brightness(self, brightness: int) -> bool:
+        self.calls.append(('set_brightness', brightness))
+        await asyncio.sleep(0)
+        return True
+
+    async def set_frequency_level(self, frequency: str, level: int) -> bool:
+        self.calls.append(('set_frequency_level', frequency, level))
+        return True
+
+
+async def _queue_behind_busy_link(gateway: Gateway, *calls):
+    """Start calls while the link is held, return their tasks and the release"""
+    lock = gateway._locks[MAC]
+    await lock.acquire()
+    tasks = [asyncio.create_task(gateway.call(MAC, method, **kwargs)) for method, kwargs in calls]
+    await asyncio.sleep(0)
+    return tasks, lock.release
+
+
+def test_queued_requests_coalesce_and_the_latest_arguments_win():
+    async def run():
+        bulb = FakeBulb()
+        gateway = Gateway([bulb])
+        tasks, release = await _queue_behind_busy_link(
+            gateway, *[('set_brightness', {'brightness': b}) for b in (10, 20, 30)])
+        release()
+        return await asyncio.gather(*tasks), bulb.calls
+
+    results, calls = asyncio.run(run())
+    assert results == [True] * 3
+    assert calls == [('set_brightness', 30)]
+
+
+def test_requests_for_different_targets_stay_separate():
+    async def run():
+        bulb = FakeBulb()
+        gateway = Gateway([bulb])
+        tasks, release = await _queue_behind_busy_link(
+            gateway,
+            ('set_frequency_level', {'frequency': 'frequency_80', 'level': 10}),
+            ('set_frequency_level', {'frequency': 'frequency_8k', 'level': 20}))
+        release()
+        await asyncio.gather(*tasks)
+        return bulb.calls
+
+    assert len(asyncio.run(run())) == 2
+
+
+def test_cancelled_first_caller_does_not_cancel_the_others():
+    async def run():
+        bulb = FakeBulb()
+        gateway = Gateway([bulb])
+        tasks, release = await _queue_behind_busy_link(
+            gateway, *[('set_brightness', {'brightness': b}) for b in (10, 20)])
+        tasks[0].cancel()
+        await asyncio.sleep(0)
+        release()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return results, bulb.calls
+
+    results, calls = asyncio.run(run())
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert results[1] is True
+    assert calls == [('set_brightness', 20)]
+
+
+def test_request_with_all_callers_cancelled_does_not_run():
+    async def run():
+        bulb = FakeBulb()
+        gateway = Gateway([bulb])
+        tasks, release = await _queue_behind_busy_link(
+            gateway, *[('set_brightness', {'brightness': b}) for b in (10, 20)])
+        for task in tasks:
+            task.cancel()
+        await asyncio.sleep(0)
+        release()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        return bulb.calls, gateway._queued
+
+    calls, queued = asyncio.run(run())
+    assert calls == []
+    assert queued == {}
@@ -0,0 +1,73 @@
+"""
+Tests of LaneScheduler ordering
+"""
+import asyncio
+
+from bluetooth_speaker_bulb.lanes import Lane, LaneScheduler
+
+
+async def _run_queued(scheduler: LaneScheduler, lanes: list[Lane]) -> list[str]:
+    """Queue one operation per lane behind a held link, return the order they ran in"""
+    order = []
+
+    async def operation(name: str, lane: Lane) -> None:
+        async with scheduler.slot(lane):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    await scheduler.acquire(Lane.INTERACTIVE)
+    tasks = [asyncio.create_task(operation(f"{lane.name.lower()}{i}", lane))
+             for i, lane in enumerate(lanes)]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_higher_lanes_go_first_and_each_lane_in_order():
+    lanes = [Lane.BULK, Lane.BACKGROUND, Lane.INTERACTIVE, Lane.BULK, Lane.INTERACTIVE]
+    order = asyncio.run(_run_queued(LaneScheduler("test", max_skips=10), lanes))
+    assert order == ["interactive2", "interactive4", "background1", "bulk0", "bulk3"]
+
+
+def test_a_lane_passed_over_max_skips_times_goes_next():
+    lanes = [Lane.BULK] + [Lane.INTERACTIVE] * 5
+    order = asyncio.run(_run_queued(LaneScheduler("test", max_skips=2), lanes))
+    assert order.index("bulk0") == 2
+
+
+def test_nested_operation_runs_without_waiting():
+    async def run():
+        scheduler = LaneScheduler("test")
+        async with scheduler.slot(Lane.BULK):
+            async with scheduler.slot(Lane.INTERACTIVE):
+                return True
+
+    assert asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        scheduler = LaneScheduler("test")
+        await scheduler.acquire(Lane.INTERACTIVE)
+        waiter = asyncio.create_task(scheduler.acquire(Lane.BULK))
+        await asyncio.sleep(0)
+        assert scheduler.depth(Lane.BULK) == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        scheduler.release()
+        # the link is free again
+        await asyncio.wait_for(scheduler.acquire(Lane.BACKGROUND), 1)
+        return scheduler.depth(Lane.BULK)
+
+    assert asyncio.run(run()) == 0
+
+
+def test_metrics_count_served_operations():
+    lanes = [Lane.BULK, Lane.INTERACTIVE]
+    scheduler = LaneScheduler("test")
+    asyncio.run(_run_queued(scheduler, lanes))
+    metrics = scheduler.metrics()
+    assert metrics['interactive']['served'] == 2
+    assert metrics['bulk']['served'] == 1
+    assert metrics['bulk']['depth'] == 0
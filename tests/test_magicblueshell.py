@@ -0,0 +1,42 @@
+"""
+Tests of the command line parser and the batch shell
+"""
+import asyncio
+import io
+import json
+
+import pytest
+
+from bluetooth_speaker_bulb.magicblueshell import Shell, parse_command
+
+
+def test_parse_text_and_json_lines():
+    assert parse_command("aa:bb,cc:dd on") == (["aa:bb", "cc:dd"], "on", [])
+    assert parse_command('{"mac": "aa:bb", "cmd": "brightness", "args": [10]}') \
+        == (["aa:bb"], "brightness", [10])
+    assert parse_command("# comment") is None
+
+
+@pytest.mark.parametrize("line", [
+    '{"mac": 5, "cmd": "on"}',
+    '{"mac": ["aa:bb", 5], "cmd": "on"}',
+    '{"mac": "aa:bb", "cmd": "on", "args": 5}',
+    '{"mac": "aa:bb", "cmd": 5}',
+    '{"cmd": "on"}',
+])
+def test_bad_json_lines_are_rejected(line):
+    with pytest.raises((ValueError, KeyError)):
+        parse_command(line)
+
+
+def test_bad_line_does_not_abort_the_batch():
+    output = io.StringIO()
+
+    async def run():
+        shell = Shell(output=output)
+        return await shell.batch(['{"mac": 5, "cmd": "on"}', 'aa:bb nope'])
+
+    assert not asyncio.run(run())
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert len(results) == 2
+    assert not any(r['ok'] for r in results)
@@ -0,0 +1,85 @@
+"""
+Tests of the MQTT bridge against SimulatedBroker and simulated bulbs
+"""
+import asyncio
+
+from bluetooth_speaker_bulb.mqtt import MqttBridge
+from bluetooth_speaker_bulb.simulator import SimulatedBroker, create_simulated_bulb
+
+MACS = [f"00:00:00:00:00:0{i}" for i in range(3)]
+PREFIX = "bluetooth_speaker_bulb"
+
+
+class FlakyBroker(SimulatedBroker):
+    """Broker whose publish raises while down"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.down = False
+
+    async def publish(self, topic: str, payload=None, qos: int = 0, retain: bool = False) -> None:
+        if self.down:
+            raise ConnectionError("broker gone")
+        await super().publish(topic, payload, qos, retain)
+
+
+async def _bridge(broker, **kwargs) -> MqttBridge:
+    bulbs = [await create_simulated_bulb(mac) for mac in MACS]
+    return MqttBridge(broker, bulbs, **kwargs)
+
+
+def test_command_topic_runs_the_setter_and_state_is_published():
+    async def run():
+        broker = SimulatedBroker()
+        bridge = await _bridge(broker, interval=0.05)
+        task = asyncio.create_task(bridge.run())
+        await asyncio.sleep(0.01)
+        await broker.publish(f"{PREFIX}/{MACS[1]}/set/set_brightness", '{"brightness": 77}')
+        await asyncio.sleep(0.3)
+        task.cancel()
+        return broker
+
+    broker = asyncio.run(run())
+    assert broker.retained[f"{PREFIX}/{MACS[1]}/state/brightness"] == b"77"
+
+
+def test_unchanged_fields_are_not_published_again():
+    async def run():
+        broker = SimulatedBroker()
+        bridge = await _bridge(broker)
+        first = await bridge.flush()
+        for mac in MACS:
+            bridge.mark_dirty(mac)
+        return first, await bridge.flush()
+
+    first, second = asyncio.run(run())
+    assert first > 0
+    assert second == 0
+
+
+def test_rate_limit_keeps_bulbs_dirty():
+    async def run():
+        bridge = await _bridge(SimulatedBroker(), max_rate=2)
+        return await bridge.flush(), bridge._dirty
+
+    published, dirty = asyncio.run(run())
+    assert published == 2
+    assert dirty
+
+
+def test_failed_publish_keeps_bulbs_dirty_and_the_flusher_alive():
+    async def run():
+        broker = FlakyBroker()
+        broker.down = True
+        bridge = await _bridge(broker, interval=0.05)
+        task = asyncio.create_task(bridge.run())
+        await asyncio.sleep(0.2)
+        assert set(bridge._dirty) == {mac.upper() for mac in MACS}
+        broker.down = False
+        await asyncio.sleep(0.2)
+        task.cancel()
+        return broker
+
+    broker = asyncio.run(run())
+    for mac in MACS:
+        assert f"{PREFIX}/{mac}/state/brightness" in broker.retained
@@ -0,0 +1,77 @@
+"""
+Tests of Pacer with a fake clock
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from bluetooth_speaker_bulb import pacing as pacing_module
+from bluetooth_speaker_bulb.pacing import PACING_DECREASE, PACING_MARGIN, Pacer
+
+CATEGORY = 0x01
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=0.0)
+    monkeypatch.setattr(pacing_module, 'time', SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_acknowledged_writes_shrink_the_spacing(clock):
+    pacer = Pacer("test", spacing=0.5)
+    pacer.wrote(CATEGORY, request=True)
+    clock.value += 0.01
+    pacer.notified(CATEGORY | 0x80)
+    assert pacer.spacing == pytest.approx(0.5 * PACING_DECREASE)
+    assert pacer.latency == pytest.approx(0.01)
+
+
+def test_spacing_stays_above_the_measured_processing_time(clock):
+    pacer = Pacer("test", spacing=0.5, minimum=0.01)
+    for _ in range(100):
+        pacer.wrote(CATEGORY, request=True)
+        clock.value += 0.1
+        pacer.notified(CATEGORY | 0x80)
+    assert pacer.spacing == pytest.approx(0.1 * PACING_MARGIN)
+
+
+def test_other_categories_are_not_answers(clock):
+    pacer = Pacer("test", spacing=0.5)
+    pacer.wrote(CATEGORY, request=True)
+    pacer.notified(0x83)
+    assert pacer.latency is None
+    assert pacer.spacing == 0.5
+
+
+def test_drops_double_the_spacing_up_to_the_maximum():
+    pacer = Pacer("test", spacing=0.5, maximum=1.5)
+    pacer.record_drop()
+    assert pacer.spacing == 1.0
+    pacer.record_drop()
+    assert pacer.spacing == 1.5
+    assert pacer.drops == 2
+
+
+def test_missing_answer_counts_as_a_drop():
+    async def run():
+        pacer = Pacer("test", spacing=0.02, minimum=0.01, maximum=0.1)
+        pacer.wrote(CATEGORY, request=True)
+        await pacer.wait()
+        return pacer
+
+    pacer = asyncio.run(run())
+    assert pacer.drops == 1
+    assert pacer.spacing == pytest.approx(0.04)
+
+
+def test_learned_values_survive_a_restart(clock):
+    pacer = Pacer("test", spacing=0.5)
+    pacer.wrote(CATEGORY, request=False)
+    clock.value += 0.05
+    pacer.notified(CATEGORY | 0x80)
+    restored = Pacer("test")
+    restored.load(pacer.to_dict())
+    assert restored.to_dict() == pacer.to_dict()
+    assert restored.to_dict()['acks_writes']
@@ -0,0 +1,113 @@
+"""
+Property tests of the wire protocol, encode_msg, verify_frame and decode_function
+"""
+from hypothesis import given
+from hypothesis import strategies as st
+
+from bluetooth_speaker_bulb.const import *
+from bluetooth_speaker_bulb.protocol import (_DECODERS, FRAME_OVERHEAD, HEADER,
+                                             decode_function, decode_light_info,
+                                             decode_speaker_equlizer,
+                                             decode_speaker_volume,
+                                             decode_time_alarm, decode_time_auto,
+                                             encode_checksum, encode_msg,
+                                             verify_frame)
+
+SET_FUNCTIONS = [
+    (SetBulbCategory.light, f) for f in SetLightFunction
+] + [
+    (SetBulbCategory.timer, f) for f in SetTimerFunction
+] + [
+    (SetBulbCategory.speaker, f) for f in SetSpeakerFunction
+]
+
+# decoder: field to byte offset in the frame
+FIELD_OFFSETS = {
+    decode_light_info: {'r': 5, 'g': 6, 'b': 7, 'cold': 8, 'warm': 9,
+                        'brightness': 10, 'on': 11, 'effect_raw': 12},
+    decode_time_auto: {'function': 4, 'on': 5, 'start_hour': 6, 'start_minut': 7,
+                       'stop_hour': 8, 'stop_minute': 9},
+    decode_time_alarm: {'alarm_no': 4, 'alarm_hour': 11, 'alarm_minute': 12, 'alarm_on': 14},
+    decode_speaker_volume: {'volume': 5},
+    decode_speaker_equlizer: {'frequency_80': 5, 'frequency_200': 6, 'frequency_500': 7,
+                              'frequency_2k': 8, 'frequency_8k': 9},
+}
+
+payloads = st.lists(st.integers(0, 255), max_size=32)
+
+
+@st.composite
+def get_frames(draw):
+    """Well formed answer of a get function the decoder knows"""
+    (category, function), (min_length, decoder) = draw(st.sampled_from(sorted(_DECODERS.items())))
+    data = draw(st.lists(st.integers(0, 255), min_size=min_length - FRAME_OVERHEAD + 1,
+                         max_size=min_length - FRAME_OVERHEAD + 8))
+    return bytes(encode_msg(category, function, data)), decoder
+
+
+@given(st.sampled_from(SET_FUNCTIONS), payloads)
+def test_set_frames_round_trip(target, data):
+    category, function = target
+    frame = encode_msg(category.value, function.value, data)
+    assert verify_frame(frame)
+    assert tuple(frame[:2]) == HEADER
+    assert len(frame) == len(data) + FRAME_OVERHEAD
+    assert frame[2] == len(data)
+    assert SetBulbCategory(frame[3]) is category
+    assert type(function)(frame[4]) is function
+    assert list(frame[5:-1]) == data
+
+
+@given(st.integers(0, 255), st.integers(0, 255), st.integers(0, 255))
+def test_int_data_is_one_byte(category, function, value):
+    assert encode_msg(category, function, value) == encode_msg(category, function, [value])
+
+
+@given(payloads)
+def test_checksum_balances_frame(data):
+    frame = encode_msg(SetBulbCategory.light.value, SetLightFunction.color.value, data)
+    assert frame[-1] == encode_checksum(frame[:-1])
+    assert (sum(frame) + 1) % 256 == 0
+
+
+@given(get_frames())
+def test_get_frames_round_trip(frame_decoder):
+    frame, decoder = frame_decoder
+    decoded = decode_function(frame)
+    assert decoded == decoder(frame)
+    for field, offset in FIELD_OFFSETS[decoder].items():
+        assert decoded[field] == frame[offset]
+
+
+@given(get_frames(), st.data())
+def test_truncated_frames_are_rejected(frame_decoder, data):
+    frame, _ = frame_decoder
+    cut = data.draw(st.integers(0, len(frame) - 1))
+    assert not verify_frame(frame[:cut])
+    assert decode_function(frame[:cut]) == []
+
+
+@given(get_frames(), st.data())
+def test_corrupted_frames_are_rejected(frame_decoder, data):
+    frame, _ = frame_decoder
+    # the length byte moves the checksum position, covered by the fuzz test below
+    position = data.draw(st.sampled_from([i for i in range(len(frame)) if i != 2]))
+    flip = data.draw(st.integers(1, 255))
+    corrupted = bytearray(frame)
+    corrupted[position] ^= flip
+    assert not verify_frame(corrupted)
+    assert decode_function(corrupted) == []
+
+
+@given(st.binary(max_size=64))
+def test_arbitrary_bytes_never_raise(buffer):
+    decoded = decode_function(buffer)
+    assert decoded == [] or verify_frame(buffer)
+
+
+@given(get_frames(), st.integers(1, 255))
+def test_wrong_length_byte_never_raises(frame_decoder, flip):
+    frame, _ = frame_decoder
+    corrupted = bytearray(frame)
+    corrupted[2] ^= flip
+    decode_function(corrupted)
@@ -0,0 +1,126 @@
+"""
+Tests of BulbScanner against a stand-in BleakScanner
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from bluetooth_speaker_bulb import scanner as scanner_module
+from bluetooth_speaker_bulb.connection import make_ble_device
+from bluetooth_speaker_bulb.scanner import BulbScanner, shared_scanner
+
+ADDRESS = "AA:BB:CC:DD:EE:FF"
+
+
+class FakeBleakScanner():
+    """Records start and stop, advertise() plays an advertisement"""
+    instances: list = []
+
+    def __init__(self, detection_callback, **kwargs) -> None:
+        self.callback = detection_callback
+        self.running = False
+        self.instances.append(self)
+
+    async def start(self) -> None:
+        self.running = True
+
+    async def stop(self) -> None:
+        self.running = False
+
+    def advertise(self, name: str = "bluetooth_speaker_bulb", rssi: int = -60) -> None:
+        self.callback(make_ble_device(ADDRESS, name),
+                      SimpleNamespace(local_name=name, rssi=rssi))
+
+
+@pytest.fixture(autouse=True)
+def fake_bleak(monkeypatch):
+    FakeBleakScanner.instances = []
+    monkeypatch.setattr(scanner_module, 'BleakScanner', FakeBleakScanner)
+
+
+def _advertise_later() -> None:
+    asyncio.get_running_loop().call_later(
+        0.01, lambda: FakeBleakScanner.instances[-1].advertise())
+
+
+def test_lookup_scan_stops_when_done():
+    async def run():
+        scanner = BulbScanner()
+        _advertise_later()
+        device = await scanner.find_device_by_address(ADDRESS, timeout=1)
+        return scanner, device
+
+    scanner, device = asyncio.run(run())
+    assert device.address == ADDRESS
+    assert not scanner.running
+    assert not FakeBleakScanner.instances[-1].running
+
+
+def test_lookup_keeps_a_scan_started_by_start():
+    async def run():
+        scanner = BulbScanner()
+        await scanner.start()
+        _advertise_later()
+        await scanner.find_device_by_address(ADDRESS, timeout=1)
+        running = scanner.running
+        await scanner.stop()
+        return running
+
+    assert asyncio.run(run())
+
+
+def test_scanner_started_on_a_finished_loop_restarts():
+    scanner = BulbScanner(ttl=0)
+
+    async def first():
+        await scanner.start()
+
+    async def second():
+        _advertise_later()
+        return await scanner.find_device_by_address(ADDRESS, timeout=1)
+
+    asyncio.run(first())
+    assert asyncio.run(second()) is not None
+    assert len(FakeBleakScanner.instances) == 2
+
+
+def test_shared_scanner_is_per_event_loop():
+    async def get():
+        return shared_scanner()
+
+    assert asyncio.run(get()) is not asyncio.run(get())
+
+
+def _streamed(advertisements: list[tuple[str, float]], ttl: float = 60) -> list:
+    async def run():
+        scanner = BulbScanner(ttl=ttl)
+        seen = []
+
+        async def consume():
+            async for entry in scanner.stream():
+                seen.append(entry.model)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        for name, wait in advertisements:
+            FakeBleakScanner.instances[-1].advertise(name)
+            await asyncio.sleep(wait)
+        await scanner.stop()
+        await task
+        return seen
+
+    return asyncio.run(run())
+
+
+def test_bulb_named_in_a_later_advertisement_is_streamed():
+    assert _streamed([(None, 0.01), ("bluetooth_speaker_bulb", 0.01)]) \
+        == ["bluetooth_speaker_bulb"]
+
+
+def test_bulb_is_streamed_once_while_seen():
+    assert len(_streamed([("bluetooth_speaker_bulb", 0.01)] * 3)) == 1
+
+
+def test_bulb_seen_again_after_the_ttl_is_streamed_again():
+    assert len(_streamed([("bluetooth_speaker_bulb", 0.05)] * 2, ttl=0.02)) == 2
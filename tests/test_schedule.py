@@ -0,0 +1,31 @@
+"""
+Tests of HostSchedule and ScheduleSync against simulated bulbs
+"""
+import asyncio
+
+import pytest
+
+from bluetooth_speaker_bulb.schedule import (SYNC_IN_SYNC, SYNC_REPROGRAMMED, HostSchedule,
+                                             ScheduleSync)
+from bluetooth_speaker_bulb.simulator import create_simulated_bulb
+
+
+def test_half_set_window_is_rejected():
+    with pytest.raises(ValueError):
+        HostSchedule(light_on=(7, 0))
+
+
+def test_sync_reprograms_once_and_keeps_the_keepalive():
+    async def run():
+        bulb = await create_simulated_bulb("AA:BB:CC:DD:EE:01")
+        bulb.start_keepalive()
+        schedule = HostSchedule(light_on=(7, 0), light_off=(8, 30), alarms=[(6, 45)])
+        sync = ScheduleSync()
+        results = [await sync.sync_bulb(bulb, schedule), await sync.sync_bulb(bulb, schedule)]
+        keepalive = bulb.keepalive
+        await bulb.stop_keepalive()
+        return results, keepalive
+
+    results, keepalive = asyncio.run(run())
+    assert results == [SYNC_REPROGRAMMED, SYNC_IN_SYNC]
+    assert keepalive
@@ -0,0 +1,26 @@
+"""
+Tests of SyncClient with simulated bulbs
+"""
+import time
+
+import pytest
+
+from bluetooth_speaker_bulb.sync import SyncClient
+
+MAC = "AA:BB:CC:DD:EE:01"
+
+
+def test_calls_from_a_thread():
+    with SyncClient(simulate=0.0, keepalive=False) as client:
+        bulb = client.bulb(MAC)
+        assert bulb.set_brightness(brightness=30)
+        assert bulb.update_light()
+        assert bulb.state['brightness'] == 30
+
+
+def test_timed_out_call_is_cancelled_and_frees_its_slot():
+    with SyncClient(simulate=5.0, keepalive=False, concurrency=1) as client:
+        with pytest.raises(TimeoutError):
+            client.call(MAC, 'update_light', timeout=0.2)
+        time.sleep(0.1)
+        assert not client._semaphore.locked()
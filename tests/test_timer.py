@@ -0,0 +1,61 @@
+"""
+Tests of Timer.diff and Bulb.set_schedule against a simulated bulb
+"""
+import asyncio
+
+from bluetooth_speaker_bulb.simulator import create_simulated_bulb
+from bluetooth_speaker_bulb.timer import Timer
+
+SCHEDULE = {
+    'auto_light': {'on': True, 'start_hour': 7, 'start_minute': 30},
+    'alarm_1': {'on': True, 'hour': 6, 'minute': 45},
+}
+
+
+def test_diff_leaves_the_known_state_alone():
+    timer = Timer()
+    msgs = timer.diff(SCHEDULE)
+    assert len(msgs) == 4
+    assert timer.diff(SCHEDULE) == msgs
+    assert not timer.matches(SCHEDULE)
+
+
+def test_sent_msgs_make_the_schedule_match():
+    timer = Timer()
+    for msg in timer.diff(SCHEDULE):
+        timer.sent(msg)
+    assert timer.matches(SCHEDULE)
+    assert timer.diff(SCHEDULE) == []
+
+
+def test_diff_only_encodes_changes():
+    timer = Timer()
+    for msg in timer.diff(SCHEDULE):
+        timer.sent(msg)
+    msgs = timer.diff({'alarm_1': {'on': False, 'hour': 6, 'minute': 45}})
+    assert len(msgs) == 1
+    timer.sent(msgs[0])
+    assert timer.schedule['alarm_1'] == {'on': False, 'hour': 6, 'minute': 45}
+
+
+def test_failed_set_schedule_is_retried_in_full():
+    async def run():
+        bulb = await create_simulated_bulb("AA:BB:CC:DD:EE:01")
+        send_cmd = bulb._connection.send_cmd
+        calls = []
+
+        async def fail_second(msg, **kwargs):
+            calls.append(msg)
+            if len(calls) == 2:
+                return False
+            return await send_cmd(msg, **kwargs)
+
+        bulb._connection.send_cmd = fail_second
+        assert not await bulb.set_schedule(SCHEDULE)
+        assert not bulb.schedule_matches(SCHEDULE)
+        assert await bulb.set_schedule(SCHEDULE)
+        # the first msg went through, the retry sends the other three
+        assert len(calls) == 5
+        assert bulb.schedule_matches(SCHEDULE)
+
+    asyncio.run(run())